@@ -0,0 +1,210 @@
+"use strict";
+
+// ====================================================================
+// Headless benchmark for the browser engine: loads chess.js and
+// lorfish.js under Node, runs LorFish.getBestMove on a fixed FEN suite
+// and perft on standard positions.
+//
+//   node benchmark.js                          search suite, depth 3
+//   node benchmark.js -d 4 -o after.json --compare before.json
+//   node benchmark.js --perft -d 4             move generation only, checked against known counts
+// ====================================================================
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+// chess.js and lorfish.js are plain browser scripts; evaluate them in one
+// context so they see each other's top-level declarations.
+const context = vm.createContext({ console, performance, Math: Object.create(Math) });
+for (const file of ['chess.js', 'lorfish.js']) {
+  vm.runInContext(fs.readFileSync(path.join(__dirname, file), 'utf8'), context, { filename: file });
+}
+const { Chess, LorFish, algOf, MAX_MOVES } = vm.runInContext('({ Chess, LorFish, algOf, MAX_MOVES })', context);
+
+const DEFAULT_DEPTH = 3;
+const WARMUP_DEPTH = 2; // untimed pass over the suite first, so the JIT has compiled the search
+
+// Same suite as p04-lorfish/benchmark.py
+const SEARCH_POSITIONS = [
+  ['startpos', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'],
+  ['pawn_race', '7k/7p/6Pp/8/8/7P/7P/7K b - - 0 1'],
+  ['bishop_pair_vs_knight', 'rnb1k3/ppp5/8/3N4/7b/2p5/6P1/6RK b - - 0 8'],
+  ['two_queens_mate', '6k1/6q1/6q1/8/8/8/8/7K w - - 24 13'],
+  ['french_advance', 'r1b1k1nr/pp3ppp/1q2p3/3pP3/1b1N4/N7/PP1B1PPP/R2QKB1R b KQkq - 0 9'],
+  ['double_promotion', '7k/2PP4/8/8/8/8/8/2K5 w - - 0 1'],
+  ['kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'],
+  ['italian', 'r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/2NP1N2/PPP2PPP/R1BQK2R b KQkq - 0 5'],
+];
+
+// Perft suite with known node counts per depth (from the Chess Programming Wiki)
+const PERFT_POSITIONS = [
+  ['startpos', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', [20, 400, 8902, 197281, 4865609]],
+  ['kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    [48, 2039, 97862, 4085603]],
+  ['position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', [14, 191, 2812, 43238, 674624]],
+  ['position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+    [6, 264, 9467, 422333]],
+  ['position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', [44, 1486, 62379, 2103487]],
+];
+
+// getBestMove adds random tiebreak noise at the root; a fixed seed keeps the
+// chosen move comparable between runs.
+function seedRandom(seed) {
+  let s = seed;
+  context.Math.random = () => {
+    s = (s * 1103515245 + 12345) & 0x7fffffff;
+    return s / 0x80000000;
+  };
+}
+
+// Search fen with an empty TT at every depth up to maxDepth; the last depth gives nodes and best move.
+function searchPosition(fen, maxDepth) {
+  const timeToDepth = {};
+  let best = null, elapsed = 0;
+  const log = console.log;
+  console.log = () => {}; // getBestMove prints its evals
+  try {
+    for (let depth = 1; depth <= maxDepth; depth++) {
+      const chess = new Chess();
+      chess.loadFen(fen);
+      LorFish.initTT();
+      seedRandom(depth);
+      const t0 = performance.now();
+      best = LorFish.getBestMove(chess, depth);
+      elapsed = (performance.now() - t0) / 1000;
+      timeToDepth[depth] = round(elapsed, 4);
+    }
+  } finally {
+    console.log = log;
+  }
+  return {
+    nodes: LorFish.nodes,
+    time: round(elapsed, 4),
+    nps: elapsed > 0 ? Math.round(LorFish.nodes / elapsed) : 0,
+    time_to_depth: timeToDepth,
+    best_move: best ? algOf(best.from) + algOf(best.to) + (best.promo || '') : null,
+  };
+}
+
+// Perft over the search path (generateMoves + pushMove), one buffer per ply.
+function perft(chess, depth, buffers) {
+  const moves = buffers[depth];
+  const n = chess.generateMoves(moves);
+  let nodes = 0;
+  for (let i = 0; i < n; i++) {
+    chess.pushMove(moves[i]);
+    if (!chess.movedIntoCheck()) nodes += depth === 1 ? 1 : perft(chess, depth - 1, buffers);
+    chess.popMove();
+  }
+  return nodes;
+}
+
+function runSearchSuite(depth) {
+  for (const [, fen] of SEARCH_POSITIONS) searchPosition(fen, Math.min(depth, WARMUP_DEPTH));
+  return SEARCH_POSITIONS.map(([name, fen]) => {
+    const result = { name, fen, depth, ...searchPosition(fen, depth) };
+    console.log(`${name.padEnd(24)} nodes=${String(result.nodes).padStart(8)}  time=${result.time.toFixed(3).padStart(8)}s  `
+      + `nps=${String(result.nps).padStart(7)}  best=${result.best_move}`);
+    return result;
+  });
+}
+
+function runPerftSuite(depth) {
+  const buffers = Array.from({ length: depth + 1 }, () => new Int32Array(MAX_MOVES));
+  return PERFT_POSITIONS.map(([name, fen, expectedCounts]) => {
+    const chess = new Chess();
+    chess.loadFen(fen);
+    const t0 = performance.now();
+    const nodes = perft(chess, depth, buffers);
+    const elapsed = (performance.now() - t0) / 1000;
+    const expected = depth <= expectedCounts.length ? expectedCounts[depth - 1] : null;
+    const ok = expected === null || nodes === expected;
+    const result = {
+      name, fen, depth, nodes, expected, ok,
+      time: round(elapsed, 4),
+      nps: elapsed > 0 ? Math.round(nodes / elapsed) : 0,
+    };
+    const status = ok ? 'ok' : `MISMATCH (expected ${expected})`;
+    console.log(`${name.padEnd(24)} perft(${depth})=${String(nodes).padStart(9)}  time=${elapsed.toFixed(3).padStart(8)}s  `
+      + `nps=${String(result.nps).padStart(8)}  ${status}`);
+    return result;
+  });
+}
+
+// Print per-position speed change against an earlier benchmark JSON.
+function compare(results, baseline) {
+  const baselineByName = new Map(baseline.positions.map(p => [p.name, p]));
+  console.log(`\nCompared with ${baseline.label || 'baseline'}:`);
+  const pct = (now, old) => {
+    const change = (now / old - 1) * 100;
+    return `${change >= 0 ? '+' : ''}${change.toFixed(1)}%`;
+  };
+  for (const p of results.positions) {
+    const old = baselineByName.get(p.name);
+    if (!old || !old.nps || !old.time) continue;
+    const moved = old.best_move === p.best_move ? '' : `  best move ${old.best_move} -> ${p.best_move}`;
+    console.log(`${p.name.padEnd(24)} nps ${String(old.nps).padStart(8)} -> ${String(p.nps).padStart(8)} (${pct(p.nps, old.nps).padStart(7)})  `
+      + `nodes ${old.nodes} -> ${p.nodes}${moved}`);
+  }
+  if (baseline.nps) {
+    console.log(`${'total'.padEnd(24)} nps ${String(baseline.nps).padStart(8)} -> ${String(results.nps).padStart(8)} `
+      + `(${pct(results.nps, baseline.nps)})`);
+  }
+}
+
+function round(x, digits) {
+  const f = 10 ** digits;
+  return Math.round(x * f) / f;
+}
+
+function parseArgs(argv) {
+  const args = { depth: DEFAULT_DEPTH, perft: false, output: null, label: null, compare: null };
+  for (let i = 0; i < argv.length; i++) {
+    const a = argv[i];
+    if (a === '-d' || a === '--depth') args.depth = parseInt(argv[++i], 10);
+    else if (a === '--perft') args.perft = true;
+    else if (a === '-o' || a === '--output') args.output = argv[++i];
+    else if (a === '--label') args.label = argv[++i];
+    else if (a === '--compare') args.compare = argv[++i];
+    else {
+      console.error('usage: node benchmark.js [-d DEPTH] [--perft] [-o OUTPUT] [--label LABEL] [--compare BASELINE]');
+      process.exit(2);
+    }
+  }
+  if (!(args.depth >= 1)) {
+    console.error('depth must be a positive integer');
+    process.exit(2);
+  }
+  return args;
+}
+
+function main() {
+  const args = parseArgs(process.argv.slice(2));
+  const positions = args.perft ? runPerftSuite(args.depth) : runSearchSuite(args.depth);
+
+  const totalNodes = positions.reduce((sum, p) => sum + p.nodes, 0);
+  const totalTime = positions.reduce((sum, p) => sum + p.time, 0);
+  const results = {
+    label: args.label,
+    mode: args.perft ? 'perft' : 'search',
+    engine: args.perft ? null : 'lorfish.js',
+    depth: args.depth,
+    node: process.version,
+    total_nodes: totalNodes,
+    total_time: round(totalTime, 4),
+    nps: totalTime > 0 ? Math.round(totalNodes / totalTime) : 0,
+    positions,
+  };
+  console.log(`\nTotal: nodes=${totalNodes}  time=${totalTime.toFixed(3)}s  nps=${results.nps}`);
+
+  if (args.output) {
+    fs.writeFileSync(args.output, JSON.stringify(results, null, 2));
+    console.log(`Results saved to: ${args.output}`);
+  }
+
+  if (args.compare) compare(results, JSON.parse(fs.readFileSync(args.compare, 'utf8')));
+
+  if (args.perft && !positions.every(p => p.ok)) process.exit(1);
+}
+
+main();
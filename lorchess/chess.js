@@ -12,26 +12,116 @@ const opp = c => c === W ? B : W;
 const inBoard = (f, r) => f >= 0 && f < 8 && r >= 0 && r < 8;
 const PIECE_NAMES = { p:'pawn', n:'knight', b:'bishop', r:'rook', q:'queen', k:'king' };
 
+// ====================================================================
+// Zobrist keys — 64-bit position hashes kept as two 32-bit halves
+// (hashLo, hashHi) and updated incrementally in pushMove/popMove.
+// ====================================================================
+const zobristRandom = (() => {
+  let s = 0x2545F491; // fixed seed: keys are identical across page loads and workers
+  return () => { s ^= s << 13; s ^= s >>> 17; s ^= s << 5; return s | 0; }; // xorshift32
+})();
+const zobristTable = n => {
+  const lo = new Int32Array(n), hi = new Int32Array(n);
+  for (let i = 0; i < n; i++) { lo[i] = zobristRandom(); hi[i] = zobristRandom(); }
+  return { lo, hi };
+};
+const ZOBRIST_PIECES   = zobristTable(12 * 64); // [(color * 6 + piece) * 64 + sq]
+const ZOBRIST_CASTLING = zobristTable(16);      // by castling-rights mask KQkq = 1|2|4|8
+const ZOBRIST_EP       = zobristTable(8);       // by en-passant file
+const ZOBRIST_SIDE     = zobristTable(1);       // xored in when black is to move
+
+// ====================================================================
+// Compact board — Int8Array(64) of piece codes: the type in the low three
+// bits (1..6 = p n b r q k) plus BLACK for black pieces, 0 for empty.
+// Moves on this path are numbers: from | to << 6 | promo type << 12 | flags.
+// The search uses pushMove/popMove on these; the { t, c } squares and move
+// objects below are built from them for the UI.
+// ====================================================================
+const PAWN = 1, KNIGHT = 2, BISHOP = 3, ROOK = 4, QUEEN = 5, KING = 6;
+const BLACK = 8;
+const TYPE_CHARS = ' pnbrqk';
+const colorBit = c => c === W ? 0 : BLACK;
+const pieceObject = code => ({ t: TYPE_CHARS[code & 7], c: code & BLACK ? B : W });
+
+const MOVE_CAPTURE = 1 << 15, MOVE_EP = 1 << 16, MOVE_CASTLE = 1 << 17, MOVE_DOUBLE = 1 << 18;
+const MAX_MOVES = 256; // size of a move buffer for generateMoves
+
+// Move object (as returned by legalMoves) <-> numeric move.
+const encodeMove = m => m.from | (m.to << 6)
+  | (m.promo ? TYPE_CHARS.indexOf(m.promo) << 12 : 0)
+  | (m.capture ? MOVE_CAPTURE : 0) | (m.enpassant ? MOVE_EP : 0)
+  | (m.castle ? MOVE_CASTLE : 0) | (m.ep_set != null ? MOVE_DOUBLE : 0);
+const decodeMove = mv => {
+  const from = mv & 63, to = (mv >> 6) & 63, promo = (mv >> 12) & 7;
+  const m = { from, to };
+  if (promo) m.promo = TYPE_CHARS[promo];
+  if (mv & MOVE_CAPTURE) m.capture = true;
+  if (mv & MOVE_EP) m.enpassant = true;
+  if (mv & MOVE_CASTLE) m.castle = to > from ? 'K' : 'Q';
+  if (mv & MOVE_DOUBLE) m.ep_set = (from + to) >> 1;
+  return m;
+};
+
+// Castling rights mask KQkq = 1|2|4|8, and the rights that survive a move
+// from or to each square (a rook or king leaving home, or a rook captured).
+const CASTLE_K = 1, CASTLE_Q = 2, CASTLE_k = 4, CASTLE_q = 8;
+const CASTLE_KEEP = new Uint8Array(64).fill(15);
+CASTLE_KEEP[0]  = 15 & ~CASTLE_Q;
+CASTLE_KEEP[7]  = 15 & ~CASTLE_K;
+CASTLE_KEEP[56] = 15 & ~CASTLE_q;
+CASTLE_KEEP[63] = 15 & ~CASTLE_k;
+
+// Zobrist piece index base per piece code: (color * 6 + type - 1) * 64.
+const ZOBRIST_BASE = new Int16Array(16);
+for (let t = PAWN; t <= KING; t++) {
+  ZOBRIST_BASE[t] = (t - 1) * 64;
+  ZOBRIST_BASE[t | BLACK] = (6 + t - 1) * 64;
+}
+
+// Target squares per origin square, in the generation order of the old
+// object-based move generator (kept so move ordering ties break the same).
+const targetTable = offsets => {
+  const table = [];
+  for (let sq = 0; sq < 64; sq++) {
+    const f = fileOf(sq), r = rankOf(sq);
+    const targets = [];
+    for (const [df, dr] of offsets) if (inBoard(f + df, r + dr)) targets.push(sqIdx(f + df, r + dr));
+    table.push(Int8Array.from(targets));
+  }
+  return table;
+};
+const KNIGHT_TARGETS = targetTable([[-2,-1],[-2,1],[-1,-2],[-1,2],[1,-2],[1,2],[2,-1],[2,1]]);
+const KING_TARGETS = targetTable([[-1,-1],[-1,0],[-1,1],[0,-1],[0,1],[1,-1],[1,0],[1,1]]);
+// RAYS[d][sq]: squares from sq outwards in direction d; 0..3 diagonal, 4..7 orthogonal.
+const RAYS = [[-1,-1],[-1,1],[1,-1],[1,1],[-1,0],[1,0],[0,-1],[0,1]].map(([df, dr]) => {
+  const table = [];
+  for (let sq = 0; sq < 64; sq++) {
+    const ray = [];
+    for (let f = fileOf(sq) + df, r = rankOf(sq) + dr; inBoard(f, r); f += df, r += dr) ray.push(sqIdx(f, r));
+    table.push(Int8Array.from(ray));
+  }
+  return table;
+});
+
+// Undo stack entry per ply: move, captured code, castling, ep, halfmove,
+// fullmove, turn, hashLo, hashHi.
+const UNDO_STRIDE = 9;
+const START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1';
+
 class Chess {
-  constructor() { this.reset(); }
+  constructor() {
+    this.board = new Int8Array(64);
+    this.kingSq = new Int8Array(2); // [white, black]
+    this.undoStack = new Int32Array(UNDO_STRIDE * 512);
+    this.ply = 0;
+    this.version = 0;
+    this.squaresVersion = -1;
+    this.squaresCache = null;
+    this.reset();
+  }
 
   reset() {
-    this.squares = new Array(64).fill(null);
-    const back = ['r','n','b','q','k','b','n','r'];
-    for (let f = 0; f < 8; f++) {
-      this.squares[sqIdx(f,0)] = { t: back[f], c: W };
-      this.squares[sqIdx(f,1)] = { t: 'p',     c: W };
-      this.squares[sqIdx(f,6)] = { t: 'p',     c: B };
-      this.squares[sqIdx(f,7)] = { t: back[f], c: B };
-    }
-    this.turn = W;
-    this.castling = { K: true, Q: true, k: true, q: true };
-    this.ep = null;
-    this.halfmove = 0;
-    this.fullmove = 1;
-    this.history = [];
-    this.positionCounts = new Map();
-    this.positionCounts.set(this.positionKey(), 1);
+    this.loadFen(START_FEN);
   }
 
   // Load a position from FEN. Throws on invalid input.
@@ -39,7 +129,7 @@ class Chess {
     const parts = String(fen || '').trim().split(/\s+/);
     if (parts.length < 4) throw new Error('FEN must have at least 4 fields');
 
-    const newSquares = new Array(64).fill(null);
+    const newBoard = new Int8Array(64);
     const ranks = parts[0].split('/');
     if (ranks.length !== 8) throw new Error('FEN must have 8 ranks separated by "/"');
 
@@ -51,8 +141,8 @@ class Chess {
           f += ch.charCodeAt(0) - 48;
         } else if ('prnbqkPRNBQK'.includes(ch)) {
           if (f >= 8) throw new Error(`FEN rank ${8 - i} overflows 8 files`);
-          const c = ch === ch.toUpperCase() ? W : B;
-          newSquares[sqIdx(f, r)] = { t: ch.toLowerCase(), c };
+          const black = ch !== ch.toUpperCase();
+          newBoard[sqIdx(f, r)] = TYPE_CHARS.indexOf(ch.toLowerCase()) | (black ? BLACK : 0);
           f++;
         } else {
           throw new Error(`FEN: bad piece char "${ch}"`);
@@ -61,372 +151,390 @@ class Chess {
       if (f !== 8) throw new Error(`FEN rank ${8 - i} does not sum to 8 squares`);
     }
 
-    let wKings = 0, bKings = 0;
-    for (const p of newSquares) {
-      if (!p || p.t !== 'k') continue;
-      if (p.c === W) wKings++; else bKings++;
+    let wKings = 0, bKings = 0, wKingSq = -1, bKingSq = -1;
+    for (let sq = 0; sq < 64; sq++) {
+      const p = newBoard[sq];
+      if ((p & 7) !== KING) continue;
+      if (p & BLACK) { bKings++; bKingSq = sq; }
+      else { wKings++; wKingSq = sq; }
     }
     if (wKings !== 1 || bKings !== 1) {
       throw new Error('FEN must have exactly one king per side');
     }
 
-    this.squares = newSquares;
-    this.turn = parts[1] === 'b' ? B : W;
-    const cr = parts[2] || '-';
-    this.castling = {
-      K: cr.includes('K'),
-      Q: cr.includes('Q'),
-      k: cr.includes('k'),
-      q: cr.includes('q'),
-    };
+    let ep = -1;
     if (parts[3] && parts[3] !== '-') {
       const file = parts[3].charCodeAt(0) - 97;
       const rank = parseInt(parts[3][1], 10) - 1;
       if (file < 0 || file > 7 || isNaN(rank) || rank < 0 || rank > 7) {
         throw new Error(`FEN: bad en-passant square "${parts[3]}"`);
       }
-      this.ep = sqIdx(file, rank);
-    } else {
-      this.ep = null;
+      ep = sqIdx(file, rank);
     }
+
+    this.board.set(newBoard);
+    this.kingSq[0] = wKingSq;
+    this.kingSq[1] = bKingSq;
+    this.turn = parts[1] === 'b' ? B : W;
+    const cr = parts[2] || '-';
+    this.castleRights = (cr.includes('K') ? CASTLE_K : 0) | (cr.includes('Q') ? CASTLE_Q : 0)
+                      | (cr.includes('k') ? CASTLE_k : 0) | (cr.includes('q') ? CASTLE_q : 0);
+    this.ep = ep; // -1 when there is no en-passant target
     this.halfmove = parts[4] ? parseInt(parts[4], 10) || 0 : 0;
     this.fullmove = parts[5] ? parseInt(parts[5], 10) || 1 : 1;
     this.history = [];
-    this.positionCounts = new Map();
-    this.positionCounts.set(this.positionKey(), 1);
+    this.ply = 0;
+    this.version++;
+    this.computeHash();
+  }
+
+  // Object view of the board for the UI: { t, c } or null per square.
+  // Reflects the last makeMove/undoMove/loadFen; pushMove/popMove inside a
+  // search do not refresh it.
+  get squares() {
+    if (this.squaresVersion !== this.version) {
+      const squares = new Array(64);
+      for (let sq = 0; sq < 64; sq++) squares[sq] = this.board[sq] ? pieceObject(this.board[sq]) : null;
+      this.squaresCache = squares;
+      this.squaresVersion = this.version;
+    }
+    return this.squaresCache;
   }
 
-  // FEN-like key for repetition detection: pieces + turn + castling + ep target.
-  positionKey() {
-    let s = '';
+  // Zobrist hash of the current position from scratch: pieces + turn +
+  // castling + ep target. pushMove/popMove keep it up to date afterwards.
+  computeHash() {
+    let lo = 0, hi = 0;
     for (let i = 0; i < 64; i++) {
-      const p = this.squares[i];
-      s += p ? (p.c === W ? p.t.toUpperCase() : p.t) : '.';
+      const p = this.board[i];
+      if (!p) continue;
+      const idx = ZOBRIST_BASE[p] + i;
+      lo ^= ZOBRIST_PIECES.lo[idx]; hi ^= ZOBRIST_PIECES.hi[idx];
     }
-    s += '|' + this.turn;
-    s += '|' + (this.castling.K ? 'K' : '') + (this.castling.Q ? 'Q' : '')
-            + (this.castling.k ? 'k' : '') + (this.castling.q ? 'q' : '');
-    s += '|' + (this.ep != null ? this.ep : '-');
-    return s;
+    const cm = this.castleRights;
+    lo ^= ZOBRIST_CASTLING.lo[cm]; hi ^= ZOBRIST_CASTLING.hi[cm];
+    if (this.ep >= 0) { lo ^= ZOBRIST_EP.lo[fileOf(this.ep)]; hi ^= ZOBRIST_EP.hi[fileOf(this.ep)]; }
+    if (this.turn === B) { lo ^= ZOBRIST_SIDE.lo[0]; hi ^= ZOBRIST_SIDE.hi[0]; }
+    this.hashLo = lo;
+    this.hashHi = hi;
   }
 
-  pseudoMovesFrom(sq, c) {
-    const piece = this.squares[sq];
-    if (!piece || piece.c !== c) return [];
-    const moves = [];
-    const f = fileOf(sq), r = rankOf(sq);
-    const them = opp(c);
-    const add = (to, opts) => moves.push(Object.assign({ from: sq, to }, opts || {}));
-
-    if (piece.t === 'p') {
-      const dir = c === W ? 1 : -1;
-      const startRank = c === W ? 1 : 6;
-      const promoRank = c === W ? 7 : 0;
-      // forward 1
-      if (inBoard(f, r + dir) && !this.squares[sqIdx(f, r + dir)]) {
-        const to = sqIdx(f, r + dir);
-        if (rankOf(to) === promoRank) {
-          for (const p of ['q','r','b','n']) add(to, { promo: p });
-        } else {
-          add(to);
-          if (r === startRank && !this.squares[sqIdx(f, r + 2*dir)]) {
-            add(sqIdx(f, r + 2*dir), { ep_set: sqIdx(f, r + dir) });
-          }
+  // How often the current position has occurred since the last loadFen,
+  // counting itself. Only positions since the last capture or pawn move can
+  // match, so the scan over the undo stack stops at the halfmove clock.
+  repetitionCount() {
+    const u = this.undoStack, lo = this.hashLo, hi = this.hashHi;
+    const stop = Math.max(0, this.ply - this.halfmove);
+    let count = 1;
+    for (let p = this.ply - 2; p >= stop; p -= 2) {
+      const s = p * UNDO_STRIDE;
+      if (u[s + 7] === lo && u[s + 8] === hi) count++;
+    }
+    return count;
+  }
+
+  // Pseudo-legal numeric moves for side c (default: side to move) written
+  // into `out`; returns the count. Castling is already checked for moving
+  // out of or through check; other moves may leave the own king attacked,
+  // which pushMove + movedIntoCheck() detects.
+  generateMoves(out, capturesOnly = false, c = colorBit(this.turn)) {
+    const board = this.board;
+    let n = 0;
+    for (let sq = 0; sq < 64; sq++) {
+      const p = board[sq];
+      if (p === 0 || (p & BLACK) !== c) continue;
+      const type = p & 7;
+      if (type === PAWN) {
+        n = this.pawnMoves(out, n, sq, c, capturesOnly);
+      } else if (type === KNIGHT || type === KING) {
+        const targets = type === KNIGHT ? KNIGHT_TARGETS[sq] : KING_TARGETS[sq];
+        for (let i = 0; i < targets.length; i++) {
+          const to = targets[i];
+          const t = board[to];
+          if (t === 0) { if (!capturesOnly) out[n++] = sq | (to << 6); }
+          else if ((t & BLACK) !== c) out[n++] = sq | (to << 6) | MOVE_CAPTURE;
         }
-      }
-      // captures
-      for (const df of [-1, 1]) {
-        const nf = f + df, nr = r + dir;
-        if (!inBoard(nf, nr)) continue;
-        const to = sqIdx(nf, nr);
-        const tgt = this.squares[to];
-        if (tgt && tgt.c === them) {
-          if (rankOf(to) === promoRank) {
-            for (const p of ['q','r','b','n']) add(to, { promo: p, capture: true });
-          } else {
-            add(to, { capture: true });
+        if (type === KING && !capturesOnly) n = this.castlingMoves(out, n, sq, c);
+      } else {
+        const first = type === ROOK ? 4 : 0, last = type === BISHOP ? 4 : 8;
+        for (let d = first; d < last; d++) {
+          const ray = RAYS[d][sq];
+          for (let i = 0; i < ray.length; i++) {
+            const to = ray[i];
+            const t = board[to];
+            if (t === 0) { if (!capturesOnly) out[n++] = sq | (to << 6); continue; }
+            if ((t & BLACK) !== c) out[n++] = sq | (to << 6) | MOVE_CAPTURE;
+            break;
           }
-        } else if (this.ep === to && !tgt) {
-          add(to, { capture: true, enpassant: true });
         }
       }
-    } else if (piece.t === 'n') {
-      const offs = [[-2,-1],[-2,1],[-1,-2],[-1,2],[1,-2],[1,2],[2,-1],[2,1]];
-      for (const [df, dr] of offs) {
-        const nf = f + df, nr = r + dr;
-        if (!inBoard(nf, nr)) continue;
-        const to = sqIdx(nf, nr);
-        const tgt = this.squares[to];
-        if (!tgt) add(to);
-        else if (tgt.c === them) add(to, { capture: true });
-      }
-    } else if (piece.t === 'b' || piece.t === 'r' || piece.t === 'q') {
-      const dirs = [];
-      if (piece.t !== 'r') dirs.push([-1,-1],[-1,1],[1,-1],[1,1]);
-      if (piece.t !== 'b') dirs.push([-1,0],[1,0],[0,-1],[0,1]);
-      for (const [df, dr] of dirs) {
-        let nf = f + df, nr = r + dr;
-        while (inBoard(nf, nr)) {
-          const to = sqIdx(nf, nr);
-          const tgt = this.squares[to];
-          if (!tgt) add(to);
-          else { if (tgt.c === them) add(to, { capture: true }); break; }
-          nf += df; nr += dr;
-        }
-      }
-    } else if (piece.t === 'k') {
-      for (let df = -1; df <= 1; df++) for (let dr = -1; dr <= 1; dr++) {
-        if (!df && !dr) continue;
-        const nf = f + df, nr = r + dr;
-        if (!inBoard(nf, nr)) continue;
-        const to = sqIdx(nf, nr);
-        const tgt = this.squares[to];
-        if (!tgt) add(to);
-        else if (tgt.c === them) add(to, { capture: true });
+    }
+    return n;
+  }
+
+  pawnMoves(out, n, sq, c, capturesOnly) {
+    const board = this.board;
+    const dir = c ? -8 : 8;
+    const r = rankOf(sq), f = fileOf(sq);
+    const startRank = c ? 6 : 1;
+    const promoRank = c ? 0 : 7;
+    const to1 = sq + dir;
+    if (to1 < 0 || to1 > 63) return n;
+    // forward 1 (and 2 from the start rank)
+    if (!capturesOnly && board[to1] === 0) {
+      if (rankOf(to1) === promoRank) {
+        for (let t = QUEEN; t >= KNIGHT; t--) out[n++] = sq | (to1 << 6) | (t << 12);
+      } else {
+        out[n++] = sq | (to1 << 6);
+        if (r === startRank && board[to1 + dir] === 0) out[n++] = sq | ((to1 + dir) << 6) | MOVE_DOUBLE;
       }
-      // castling (path-empty + rook check; check/attack tested in legalMoves)
-      const home = c === W ? 0 : 7;
-      const KK = c === W ? 'K' : 'k';
-      const QQ = c === W ? 'Q' : 'q';
-      if (r === home && f === 4) {
-        const rookK = this.squares[sqIdx(7, home)];
-        if (this.castling[KK]
-            && !this.squares[sqIdx(5, home)]
-            && !this.squares[sqIdx(6, home)]
-            && rookK && rookK.t === 'r' && rookK.c === c) {
-          add(sqIdx(6, home), { castle: 'K' });
-        }
-        const rookQ = this.squares[sqIdx(0, home)];
-        if (this.castling[QQ]
-            && !this.squares[sqIdx(1, home)]
-            && !this.squares[sqIdx(2, home)]
-            && !this.squares[sqIdx(3, home)]
-            && rookQ && rookQ.t === 'r' && rookQ.c === c) {
-          add(sqIdx(2, home), { castle: 'Q' });
+    }
+    // captures
+    for (let df = -1; df <= 1; df += 2) {
+      if (f + df < 0 || f + df > 7) continue;
+      const to = to1 + df;
+      const t = board[to];
+      if (t !== 0 && (t & BLACK) !== c) {
+        if (rankOf(to) === promoRank) {
+          for (let pt = QUEEN; pt >= KNIGHT; pt--) out[n++] = sq | (to << 6) | (pt << 12) | MOVE_CAPTURE;
+        } else {
+          out[n++] = sq | (to << 6) | MOVE_CAPTURE;
         }
+      } else if (this.ep === to && t === 0) {
+        out[n++] = sq | (to << 6) | MOVE_CAPTURE | MOVE_EP;
       }
     }
-    return moves;
+    return n;
   }
 
-  isAttacked(sq, byColor) {
-    const f = fileOf(sq), r = rankOf(sq);
-    // pawn (attacker of byColor moves toward us; their pawn at r-dir attacks us)
-    const dir = byColor === W ? -1 : 1;
-    for (const df of [-1, 1]) {
-      const nf = f + df, nr = r + dir;
-      if (!inBoard(nf, nr)) continue;
-      const p = this.squares[sqIdx(nf, nr)];
-      if (p && p.c === byColor && p.t === 'p') return true;
+  // Castling: rights, empty path, own rook in the corner, and the king not
+  // in check or passing through an attacked square. Landing in check is
+  // caught like any other move.
+  castlingMoves(out, n, sq, c) {
+    const home = c ? 56 : 0;
+    if (sq !== home + 4) return n;
+    const board = this.board, rook = ROOK | c, them = c ^ BLACK;
+    const kRight = c ? CASTLE_k : CASTLE_K, qRight = c ? CASTLE_q : CASTLE_Q;
+    if ((this.castleRights & kRight) && board[home + 5] === 0 && board[home + 6] === 0
+        && board[home + 7] === rook
+        && !this.isAttacked(sq, them) && !this.isAttacked(home + 5, them)) {
+      out[n++] = sq | ((home + 6) << 6) | MOVE_CASTLE;
     }
-    // knight
-    const knightOffs = [[-2,-1],[-2,1],[-1,-2],[-1,2],[1,-2],[1,2],[2,-1],[2,1]];
-    for (const [df, dr] of knightOffs) {
-      const nf = f + df, nr = r + dr;
-      if (!inBoard(nf, nr)) continue;
-      const p = this.squares[sqIdx(nf, nr)];
-      if (p && p.c === byColor && p.t === 'n') return true;
+    if ((this.castleRights & qRight) && board[home + 1] === 0 && board[home + 2] === 0
+        && board[home + 3] === 0 && board[home] === rook
+        && !this.isAttacked(sq, them) && !this.isAttacked(home + 3, them)) {
+      out[n++] = sq | ((home + 2) << 6) | MOVE_CASTLE;
     }
-    // sliders
-    const diag = [[-1,-1],[-1,1],[1,-1],[1,1]];
-    const ortho = [[-1,0],[1,0],[0,-1],[0,1]];
-    for (const [df, dr] of diag) {
-      let nf = f + df, nr = r + dr;
-      while (inBoard(nf, nr)) {
-        const p = this.squares[sqIdx(nf, nr)];
-        if (p) {
-          if (p.c === byColor && (p.t === 'b' || p.t === 'q')) return true;
-          break;
-        }
-        nf += df; nr += dr;
-      }
+    return n;
+  }
+
+  // Is `sq` attacked by side `by` (0 for white, BLACK for black)?
+  isAttacked(sq, by) {
+    const board = this.board;
+    const f = fileOf(sq);
+    // pawn: an attacking pawn sits one rank behind sq from its own side
+    const pawn = PAWN | by;
+    const pr = by ? sq + 8 : sq - 8;
+    if (pr >= 0 && pr < 64) {
+      if (f > 0 && board[pr - 1] === pawn) return true;
+      if (f < 7 && board[pr + 1] === pawn) return true;
     }
-    for (const [df, dr] of ortho) {
-      let nf = f + df, nr = r + dr;
-      while (inBoard(nf, nr)) {
-        const p = this.squares[sqIdx(nf, nr)];
-        if (p) {
-          if (p.c === byColor && (p.t === 'r' || p.t === 'q')) return true;
-          break;
-        }
-        nf += df; nr += dr;
+    const knight = KNIGHT | by;
+    const kt = KNIGHT_TARGETS[sq];
+    for (let i = 0; i < kt.length; i++) if (board[kt[i]] === knight) return true;
+    const queen = QUEEN | by;
+    for (let d = 0; d < 8; d++) {
+      const slider = d < 4 ? (BISHOP | by) : (ROOK | by);
+      const ray = RAYS[d][sq];
+      for (let i = 0; i < ray.length; i++) {
+        const p = board[ray[i]];
+        if (p === 0) continue;
+        if (p === slider || p === queen) return true;
+        break;
       }
     }
-    // king
-    for (let df = -1; df <= 1; df++) for (let dr = -1; dr <= 1; dr++) {
-      if (!df && !dr) continue;
-      const nf = f + df, nr = r + dr;
-      if (!inBoard(nf, nr)) continue;
-      const p = this.squares[sqIdx(nf, nr)];
-      if (p && p.c === byColor && p.t === 'k') return true;
-    }
+    const king = KING | by;
+    const ks = KING_TARGETS[sq];
+    for (let i = 0; i < ks.length; i++) if (board[ks[i]] === king) return true;
     return false;
   }
 
   findKing(c) {
-    for (let i = 0; i < 64; i++) {
-      const p = this.squares[i];
-      if (p && p.c === c && p.t === 'k') return i;
-    }
-    return -1;
+    return this.kingSq[c === W ? 0 : 1];
   }
 
   inCheck(c) {
-    if (c === undefined) c = this.turn;
-    return this.isAttacked(this.findKing(c), opp(c));
+    const cb = colorBit(c === undefined ? this.turn : c);
+    return this.isAttacked(this.kingSq[cb >> 3], cb ^ BLACK);
+  }
+
+  // After pushMove: true when the side that just moved left its king attacked.
+  movedIntoCheck() {
+    const u = this.undoStack[(this.ply - 1) * UNDO_STRIDE + 6]; // mover: 0 white, 1 black
+    return this.isAttacked(this.kingSq[u], u ? 0 : BLACK);
+  }
+
+  // True if any of the first n pseudo-legal moves in `moves` is legal.
+  hasLegalMove(moves, n) {
+    for (let i = 0; i < n; i++) {
+      this.pushMove(moves[i]);
+      const legal = !this.movedIntoCheck();
+      this.popMove();
+      if (legal) return true;
+    }
+    return false;
   }
 
   legalMoves(forColor) {
-    const c = forColor || this.turn;
+    const list = new Int32Array(MAX_MOVES);
+    const n = this.generateMoves(list, false, colorBit(forColor || this.turn));
     const moves = [];
-    for (let sq = 0; sq < 64; sq++) {
-      const p = this.squares[sq];
-      if (!p || p.c !== c) continue;
-      for (const m of this.pseudoMovesFrom(sq, c)) {
-        if (m.castle) {
-          // Can't castle out of check, through check, or into check.
-          if (this.inCheck(c)) continue;
-          const home = c === W ? 0 : 7;
-          const passSq = m.castle === 'K' ? sqIdx(5, home) : sqIdx(3, home);
-          if (this.isAttacked(passSq, opp(c))) continue;
-        }
-        // Validation make/undo — skip repetition tracking for performance.
-        this.makeMove(m, false);
-        if (!this.isAttacked(this.findKing(c), opp(c))) moves.push(m);
-        this.undoMove();
-      }
+    for (let i = 0; i < n; i++) {
+      this.pushMove(list[i]);
+      const legal = !this.movedIntoCheck();
+      this.popMove();
+      if (legal) moves.push(decodeMove(list[i]));
     }
     return moves;
   }
 
-  makeMove(m, trackPosition = true) {
-    const piece = this.squares[m.from];
-    const captured = m.enpassant
-      ? this.squares[sqIdx(fileOf(m.to), rankOf(m.from))]
-      : this.squares[m.to];
-
-    const histEntry = {
-      move: m,
-      captured,
-      castling: { K: this.castling.K, Q: this.castling.Q, k: this.castling.k, q: this.castling.q },
-      ep: this.ep,
-      halfmove: this.halfmove,
-      fullmove: this.fullmove,
-      turn: this.turn,
-      tracked: trackPosition,
-      newKey: null,
-    };
-    this.history.push(histEntry);
-
-    this.squares[m.from] = null;
-    this.squares[m.to] = m.promo ? { t: m.promo, c: piece.c } : piece;
-
-    if (m.enpassant) {
-      this.squares[sqIdx(fileOf(m.to), rankOf(m.from))] = null;
-    }
+  // Plays a move object from legalMoves() and records it in `history`.
+  makeMove(m) {
+    const captured = this.board[m.enpassant ? m.to ^ 8 : m.to];
+    this.history.push({ move: m, captured: captured ? pieceObject(captured) : null });
+    this.pushMove(encodeMove(m));
+    this.version++;
+  }
 
-    if (m.castle === 'K') {
-      const r = rankOf(m.from);
-      this.squares[sqIdx(5, r)] = this.squares[sqIdx(7, r)];
-      this.squares[sqIdx(7, r)] = null;
-    } else if (m.castle === 'Q') {
-      const r = rankOf(m.from);
-      this.squares[sqIdx(3, r)] = this.squares[sqIdx(0, r)];
-      this.squares[sqIdx(0, r)] = null;
-    }
+  undoMove() {
+    if (this.history.length === 0) return;
+    this.history.pop();
+    this.popMove();
+    this.version++;
+  }
 
-    // Castling rights updates
-    if (piece.t === 'k') {
-      if (piece.c === W) { this.castling.K = false; this.castling.Q = false; }
-      else { this.castling.k = false; this.castling.q = false; }
+  // Search-path make: numeric move, no history entry, no squares refresh.
+  pushMove(mv) {
+    const board = this.board;
+    const from = mv & 63, to = (mv >> 6) & 63, promo = (mv >> 12) & 7;
+    const piece = board[from];
+    const c = piece & BLACK;
+    const capSq = mv & MOVE_EP ? to ^ 8 : to; // en passant: captured pawn is beside the origin
+    const captured = board[capSq];
+
+    let s = this.ply * UNDO_STRIDE;
+    if (s + UNDO_STRIDE > this.undoStack.length) {
+      const grown = new Int32Array(this.undoStack.length * 2);
+      grown.set(this.undoStack);
+      this.undoStack = grown;
+    }
+    const u = this.undoStack;
+    u[s] = mv; u[s + 1] = captured; u[s + 2] = this.castleRights; u[s + 3] = this.ep;
+    u[s + 4] = this.halfmove; u[s + 5] = this.fullmove; u[s + 6] = this.turn === W ? 0 : 1;
+    u[s + 7] = this.hashLo; u[s + 8] = this.hashHi;
+    this.ply++;
+
+    const PL = ZOBRIST_PIECES.lo, PH = ZOBRIST_PIECES.hi;
+    let lo = this.hashLo, hi = this.hashHi;
+    const moved = promo ? promo | c : piece;
+    let idx = ZOBRIST_BASE[piece] + from; lo ^= PL[idx]; hi ^= PH[idx];
+    idx = ZOBRIST_BASE[moved] + to;       lo ^= PL[idx]; hi ^= PH[idx];
+    if (captured) {
+      idx = ZOBRIST_BASE[captured] + capSq; lo ^= PL[idx]; hi ^= PH[idx];
+      board[capSq] = 0;
+    }
+    board[from] = 0;
+    board[to] = moved;
+
+    let rights = this.castleRights & CASTLE_KEEP[from] & CASTLE_KEEP[to];
+    if ((piece & 7) === KING) {
+      this.kingSq[c >> 3] = to;
+      rights &= c ? ~(CASTLE_k | CASTLE_q) : ~(CASTLE_K | CASTLE_Q);
+      if (mv & MOVE_CASTLE) {
+        const rookFrom = to > from ? to + 1 : to - 2;
+        const rookTo   = to > from ? to - 1 : to + 1;
+        const rook = board[rookFrom];
+        idx = ZOBRIST_BASE[rook] + rookFrom; lo ^= PL[idx]; hi ^= PH[idx];
+        idx = ZOBRIST_BASE[rook] + rookTo;   lo ^= PL[idx]; hi ^= PH[idx];
+        board[rookTo] = rook;
+        board[rookFrom] = 0;
+      }
+    }
+    if (rights !== this.castleRights) {
+      lo ^= ZOBRIST_CASTLING.lo[this.castleRights] ^ ZOBRIST_CASTLING.lo[rights];
+      hi ^= ZOBRIST_CASTLING.hi[this.castleRights] ^ ZOBRIST_CASTLING.hi[rights];
+      this.castleRights = rights;
     }
-    if (m.from === sqIdx(0,0) || m.to === sqIdx(0,0)) this.castling.Q = false;
-    if (m.from === sqIdx(7,0) || m.to === sqIdx(7,0)) this.castling.K = false;
-    if (m.from === sqIdx(0,7) || m.to === sqIdx(0,7)) this.castling.q = false;
-    if (m.from === sqIdx(7,7) || m.to === sqIdx(7,7)) this.castling.k = false;
 
-    this.ep = (m.ep_set != null) ? m.ep_set : null;
+    if (this.ep >= 0) { lo ^= ZOBRIST_EP.lo[fileOf(this.ep)]; hi ^= ZOBRIST_EP.hi[fileOf(this.ep)]; }
+    this.ep = mv & MOVE_DOUBLE ? (from + to) >> 1 : -1;
+    if (this.ep >= 0) { lo ^= ZOBRIST_EP.lo[fileOf(this.ep)]; hi ^= ZOBRIST_EP.hi[fileOf(this.ep)]; }
 
-    if (piece.t === 'p' || captured) this.halfmove = 0;
+    if ((piece & 7) === PAWN || captured) this.halfmove = 0;
     else this.halfmove++;
 
     if (this.turn === B) this.fullmove++;
     this.turn = opp(this.turn);
-
-    if (trackPosition) {
-      const key = this.positionKey();
-      histEntry.newKey = key;
-      this.positionCounts.set(key, (this.positionCounts.get(key) || 0) + 1);
-    }
+    this.hashLo = lo ^ ZOBRIST_SIDE.lo[0];
+    this.hashHi = hi ^ ZOBRIST_SIDE.hi[0];
   }
 
-  undoMove() {
-    if (this.history.length === 0) return;
-    const h = this.history.pop();
-    const m = h.move;
-
-    if (h.tracked && h.newKey) {
-      const cur = (this.positionCounts.get(h.newKey) || 0) - 1;
-      if (cur <= 0) this.positionCounts.delete(h.newKey);
-      else this.positionCounts.set(h.newKey, cur);
-    }
-
-    this.castling = h.castling;
-    this.ep = h.ep;
-    this.halfmove = h.halfmove;
-    this.fullmove = h.fullmove;
-    this.turn = h.turn;
-
-    const movedPiece = this.squares[m.to];
-    this.squares[m.from] = m.promo ? { t: 'p', c: movedPiece.c } : movedPiece;
-
-    if (m.enpassant) {
-      this.squares[m.to] = null;
-      this.squares[sqIdx(fileOf(m.to), rankOf(m.from))] = h.captured;
-    } else {
-      this.squares[m.to] = h.captured;
+  popMove() {
+    this.ply--;
+    const s = this.ply * UNDO_STRIDE;
+    const u = this.undoStack;
+    const board = this.board;
+    const mv = u[s], captured = u[s + 1];
+    const from = mv & 63, to = (mv >> 6) & 63;
+    const moved = board[to];
+    const c = moved & BLACK;
+
+    board[from] = (mv >> 12) & 7 ? PAWN | c : moved;
+    board[to] = 0;
+    if (captured) board[mv & MOVE_EP ? to ^ 8 : to] = captured;
+    if ((moved & 7) === KING) {
+      this.kingSq[c >> 3] = from;
+      if (mv & MOVE_CASTLE) {
+        const rookFrom = to > from ? to + 1 : to - 2;
+        const rookTo   = to > from ? to - 1 : to + 1;
+        board[rookFrom] = board[rookTo];
+        board[rookTo] = 0;
+      }
     }
 
-    if (m.castle === 'K') {
-      const r = rankOf(m.from);
-      this.squares[sqIdx(7, r)] = this.squares[sqIdx(5, r)];
-      this.squares[sqIdx(5, r)] = null;
-    } else if (m.castle === 'Q') {
-      const r = rankOf(m.from);
-      this.squares[sqIdx(0, r)] = this.squares[sqIdx(3, r)];
-      this.squares[sqIdx(3, r)] = null;
-    }
+    this.castleRights = u[s + 2];
+    this.ep = u[s + 3];
+    this.halfmove = u[s + 4];
+    this.fullmove = u[s + 5];
+    this.turn = u[s + 6] ? B : W;
+    this.hashLo = u[s + 7];
+    this.hashHi = u[s + 8];
   }
 
   isInsufficientMaterial() {
-    const ps = [];
-    for (let i = 0; i < 64; i++) {
-      const p = this.squares[i];
-      if (p) ps.push({ t: p.t, c: p.c, sq: i });
-    }
-    if (ps.length === 2) return true;
-    if (ps.length === 3) {
-      const nk = ps.find(p => p.t !== 'k');
-      if (nk && (nk.t === 'b' || nk.t === 'n')) return true;
-    }
-    if (ps.length === 4) {
-      const bs = ps.filter(p => p.t === 'b');
-      if (bs.length === 2 && ps.filter(p => p.t === 'k').length === 2) {
-        const c0 = (fileOf(bs[0].sq) + rankOf(bs[0].sq)) & 1;
-        const c1 = (fileOf(bs[1].sq) + rankOf(bs[1].sq)) & 1;
-        if (c0 === c1) return true;
-      }
+    const board = this.board;
+    let count = 0, minor = 0, bishops = 0, bishopColors = 0;
+    for (let sq = 0; sq < 64; sq++) {
+      const p = board[sq];
+      if (p === 0) continue;
+      if (++count > 4) return false;
+      const type = p & 7;
+      if (type === KNIGHT) minor++;
+      else if (type === BISHOP) { minor++; bishops++; bishopColors += (fileOf(sq) + rankOf(sq)) & 1; }
     }
-    return false;
+    if (count === 2) return true;
+    if (count === 3) return minor === 1;
+    // K+B vs K+B (or K+BB vs K) with all bishops on the same colour
+    return count === 4 && bishops === 2 && (bishopColors === 0 || bishopColors === 2);
   }
 
   isCheckmate() { return this.inCheck() && this.legalMoves().length === 0; }
   isStalemate() { return !this.inCheck() && this.legalMoves().length === 0; }
   isThreefoldRepetition() {
-    return (this.positionCounts.get(this.positionKey()) || 0) >= 3;
+    return this.repetitionCount() >= 3;
   }
   isFivefoldRepetition() {
-    return (this.positionCounts.get(this.positionKey()) || 0) >= 5;
+    return this.repetitionCount() >= 5;
   }
   isGameOver() {
     return this.legalMoves().length === 0
@@ -442,22 +550,22 @@ class Chess {
 
   // SAN — call BEFORE making the move
   moveToSan(m) {
-    const piece = this.squares[m.from];
+    const piece = this.board[m.from];
+    const type = piece & 7;
     let san;
     if (m.castle === 'K') san = 'O-O';
     else if (m.castle === 'Q') san = 'O-O-O';
     else {
       const isCap = !!(m.capture || m.enpassant);
-      if (piece.t === 'p') {
+      if (type === PAWN) {
         san = '';
         if (isCap) san += String.fromCharCode(97 + fileOf(m.from)) + 'x';
         san += algOf(m.to);
         if (m.promo) san += '=' + m.promo.toUpperCase();
       } else {
-        san = piece.t.toUpperCase();
-        const cands = this.legalMoves(piece.c).filter(om =>
-          om.to === m.to && om.from !== m.from &&
-          this.squares[om.from] && this.squares[om.from].t === piece.t
+        san = TYPE_CHARS[type].toUpperCase();
+        const cands = this.legalMoves(piece & BLACK ? B : W).filter(om =>
+          om.to === m.to && om.from !== m.from && (this.board[om.from] & 7) === type
         );
         if (cands.length > 0) {
           const sameFile = cands.some(c => fileOf(c.from) === fileOf(m.from));
@@ -470,9 +578,9 @@ class Chess {
         san += algOf(m.to);
       }
     }
-    this.makeMove(m);
+    this.pushMove(encodeMove(m));
     if (this.inCheck()) san += this.legalMoves().length === 0 ? '#' : '+';
-    this.undoMove();
+    this.popMove();
     return san;
   }
 }
@@ -0,0 +1,32 @@
+"use strict";
+
+// ====================================================================
+// Engine worker — runs the LorFish search off the main thread
+// ====================================================================
+importScripts('chess.js', 'lorfish.js');
+
+const workerChess = new Chess();
+
+// The game is sent as its starting FEN plus the moves played, so the worker's
+// position carries the same repetition history as the page's.
+//   request: { id, startFen, moves: [{ from, to, promo }], depth, timeMs }
+//   reply:   { id, move: { from, to, promo } | null }
+// Cancellation is done by the page terminating the worker.
+const sameMove = (m, mv) => m.from === mv.from && m.to === mv.to && (m.promo || null) === mv.promo;
+
+self.onmessage = e => {
+  const { id, startFen, moves, depth, timeMs } = e.data;
+  if (startFen) workerChess.loadFen(startFen);
+  else workerChess.reset();
+  for (const mv of moves) {
+    const m = workerChess.legalMoves().find(lm => sameMove(lm, mv));
+    if (!m) throw new Error(`Illegal move in game history: ${algOf(mv.from)}${algOf(mv.to)}`);
+    workerChess.makeMove(m);
+  }
+
+  const best = LorFish.getBestMove(workerChess, depth, timeMs);
+  self.postMessage({
+    id,
+    move: best ? { from: best.from, to: best.to, promo: best.promo || null } : null,
+  });
+};
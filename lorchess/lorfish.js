@@ -3,6 +3,15 @@
 // ====================================================================
 // LorFish engine — port of lorfish.py
 // ====================================================================
+
+// Transposition table bound types.
+const TT_EXACT = 0, TT_LOWER = 1, TT_UPPER = 2;
+// Mate scores depend on the remaining depth, so the TT only uses scores below
+// this for cutoffs (mate scores still provide the move for ordering).
+const TT_MATE_THRESHOLD = 90000;
+// Thrown from inside the search when the per-move time budget runs out.
+const SEARCH_TIMEOUT = new Error('search timeout');
+
 const LorFish = {
   // Same piece values and PSTs as the Python (sunfish-derived).
   pieceValues: { p: 100, n: 280, b: 320, r: 479, q: 929, k: 0 },
@@ -101,19 +110,101 @@ const LorFish = {
   // evaluate(): full value when phase==0, 25% when phase==24.
   passedPawnBonus: [0, 0, 10, 20, 40, 70, 120, 0],
 
+  // Typed copies of the tables above indexed by piece type code (PAWN..KING),
+  // built by initTables(). egTable falls back to the middlegame PST.
+  value: null,
+  mgTable: null,
+  egTable: null,
+
+  // Per-ply move and ordering-score buffers for the search, indexed by the
+  // distance from the root and allocated on first use.
+  moveLists: [],
+  scoreLists: [],
+  rootPly: 0,
+
+  // Transposition table: parallel typed arrays indexed by hashLo & ttMask and
+  // verified with hashHi. 16 bytes per entry, sized to a power of two within
+  // ttSizeMB and allocated on first use.
+  ttSizeMB: 16,
+  ttMask: 0,
+  ttKey: null,    // Int32Array   hashHi of the stored position
+  ttMove: null,   // Int32Array   numeric best move
+  ttScore: null,  // Int32Array
+  ttDepth: null,  // Int8Array
+  ttFlag: null,   // Uint8Array   TT_EXACT / TT_LOWER / TT_UPPER
+  ttAge: null,    // Uint8Array   search generation that wrote the entry
+  ttGeneration: 0,
+  ttProbes: 0,
+  ttHits: 0,
+
+  // Iterative deepening ceiling when searching on a time budget.
+  maxDepth: 64,
+  // Root moves within this many centipawns of the best get exact scores, so
+  // the ±10 tiebreaker noise in getBestMove can pick any of them.
+  rootNoiseMargin: 20,
+  deadline: 0,
+
+  initTables() {
+    this.value = new Int16Array(KING + 1);
+    this.mgTable = [null];
+    this.egTable = [null];
+    for (let t = PAWN; t <= KING; t++) {
+      const ch = TYPE_CHARS[t];
+      this.value[t] = this.pieceValues[ch];
+      this.mgTable[t] = Int16Array.from(this.pst[ch]);
+      this.egTable[t] = Int16Array.from(this.pstEnd[ch] || this.pst[ch]);
+    }
+  },
+
+  initTT() {
+    const entries = 1 << Math.floor(Math.log2(this.ttSizeMB * 1024 * 1024 / 16));
+    this.ttMask = entries - 1;
+    this.ttKey = new Int32Array(entries);
+    this.ttMove = new Int32Array(entries);
+    this.ttScore = new Int32Array(entries);
+    this.ttDepth = new Int8Array(entries);
+    this.ttFlag = new Uint8Array(entries);
+    this.ttAge = new Uint8Array(entries);
+  },
+
+  // Index of the entry for the current position, or -1 on a miss.
+  ttProbe(chess) {
+    this.ttProbes++;
+    const i = chess.hashLo & this.ttMask;
+    if (this.ttKey[i] !== chess.hashHi || this.ttMove[i] === 0) return -1;
+    this.ttHits++;
+    return i;
+  },
+
+  // Depth-preferred replacement, except that entries from an older search
+  // are always overwritten.
+  ttStore(chess, depth, flag, score, move) {
+    const i = chess.hashLo & this.ttMask;
+    if (this.ttKey[i] !== chess.hashHi && this.ttAge[i] === this.ttGeneration
+        && this.ttDepth[i] > depth) return;
+    this.ttKey[i] = chess.hashHi;
+    this.ttMove[i] = move;
+    this.ttScore[i] = score;
+    this.ttDepth[i] = depth;
+    this.ttFlag[i] = flag;
+    this.ttAge[i] = this.ttGeneration;
+  },
+
   // True when the pawn at `sq` has no opposing pawn on its file or either
   // adjacent file, on any rank between it and promotion.
+  // `color` is the pawn's colour bit (0 or BLACK).
   isPassedPawn(chess, sq, color) {
+    const board = chess.board;
+    const enemyPawn = PAWN | (color ^ BLACK);
     const f = sq & 7;
     const r = sq >> 3;
-    const step = color === W ? 1 : -1;
-    const last = color === W ? 7 : 0;
+    const step = color ? -1 : 1;
+    const last = color ? 0 : 7;
     for (let nr = r + step; nr !== last + step; nr += step) {
       for (let df = -1; df <= 1; df++) {
         const nf = f + df;
         if (nf < 0 || nf > 7) continue;
-        const p = chess.squares[nr * 8 + nf];
-        if (p && p.t === 'p' && p.c !== color) return false;
+        if (board[nr * 8 + nf] === enemyPawn) return false;
       }
     }
     return true;
@@ -122,13 +213,13 @@ const LorFish = {
   // Sum of non-pawn piece weights across both sides.
   // 24 at the starting position; 0 in a pure pawn endgame.
   gamePhase(chess) {
+    const board = chess.board;
     let phase = 0;
     for (let i = 0; i < 64; i++) {
-      const p = chess.squares[i];
-      if (!p) continue;
-      if (p.t === 'n' || p.t === 'b') phase += 1;
-      else if (p.t === 'r')           phase += 2;
-      else if (p.t === 'q')           phase += 4;
+      const t = board[i] & 7;
+      if (t === KNIGHT || t === BISHOP) phase += 1;
+      else if (t === ROOK)              phase += 2;
+      else if (t === QUEEN)             phase += 4;
     }
     return phase;
   },
@@ -141,17 +232,19 @@ const LorFish = {
     let wPieces = 0, bPieces = 0;
     let wMajor = 0, bMajor = 0;
     let wPawns = 0, bPawns = 0;
+    const board = chess.board;
     for (let i = 0; i < 64; i++) {
-      const p = chess.squares[i];
+      const p = board[i];
       if (!p) continue;
-      if (p.c === W) {
+      const t = p & 7;
+      if (!(p & BLACK)) {
         wPieces++;
-        if (p.t === 'r' || p.t === 'q') wMajor++;
-        else if (p.t === 'p') wPawns++;
+        if (t === ROOK || t === QUEEN) wMajor++;
+        else if (t === PAWN) wPawns++;
       } else {
         bPieces++;
-        if (p.t === 'r' || p.t === 'q') bMajor++;
-        else if (p.t === 'p') bPawns++;
+        if (t === ROOK || t === QUEEN) bMajor++;
+        else if (t === PAWN) bPawns++;
       }
     }
     if (wPieces === 1 && bPieces > 1 && bMajor >= 1 && bPawns === 0) {
@@ -169,13 +262,7 @@ const LorFish = {
   // to dominate rook-PST jitter (~30 cp swings) so the engine consistently
   // makes progress instead of shuffling.
   loneKingMateTerm(chess, lk) {
-    let wKsq = -1, bKsq = -1;
-    for (let i = 0; i < 64; i++) {
-      const p = chess.squares[i];
-      if (p && p.t === 'k') {
-        if (p.c === W) wKsq = i; else bKsq = i;
-      }
-    }
+    const wKsq = chess.kingSq[0], bKsq = chess.kingSq[1];
     const winSq = lk.winner === W ? wKsq : bKsq;
     const losSq = lk.loser  === W ? wKsq : bKsq;
     const wf = winSq & 7, wr = winSq >> 3;
@@ -209,49 +296,63 @@ const LorFish = {
     return baseDepth;
   },
 
-  orderMoves(chess, moves) {
-    // MVV-LVA + promotion bonus. Skipping gives_check bonus for performance.
-    const scored = new Array(moves.length);
-    for (let i = 0; i < moves.length; i++) {
-      const m = moves[i];
+  // Sorts the first n numeric moves in place, best first (stable insertion
+  // sort; `scores` is scratch space of the same size).
+  orderMoves(chess, moves, n, scores, ttMove = 0) {
+    // TT move first, then MVV-LVA + promotion bonus. Skipping gives_check bonus for performance.
+    const board = chess.board, value = this.value;
+    for (let i = 0; i < n; i++) {
+      const mv = moves[i];
       let s = 0;
-      const victim = m.enpassant ? { t: 'p' } : chess.squares[m.to];
-      const attacker = chess.squares[m.from];
-      if (victim && attacker) {
-        s += (this.pieceValues[victim.t] || 0) * 10;
-        s -= (this.pieceValues[attacker.t] || 0) / 100 | 0;
+      if (mv === ttMove) s += 1000000;
+      const victim = mv & MOVE_EP ? PAWN : board[(mv >> 6) & 63] & 7;
+      if (victim) {
+        s += value[victim] * 10;
+        s -= value[board[mv & 63] & 7] / 100 | 0;
+      }
+      if ((mv >> 12) & 7) s += 8000;
+      let j = i;
+      while (j > 0 && scores[j - 1] < s) {
+        moves[j] = moves[j - 1];
+        scores[j] = scores[j - 1];
+        j--;
       }
-      if (m.promo) s += 8000;
-      scored[i] = { m, s };
+      moves[j] = mv;
+      scores[j] = s;
+    }
+  },
+
+  moveList(ply) {
+    while (this.moveLists.length <= ply) {
+      this.moveLists.push(new Int32Array(MAX_MOVES));
+      this.scoreLists.push(new Int32Array(MAX_MOVES));
     }
-    scored.sort((a, b) => b.s - a.s);
-    return scored.map(x => x.m);
+    return this.moveLists[ply];
   },
 
   evaluate(chess) {
     const lk = this.isLoneKingMate(chess);
     const phase = this.gamePhase(chess);   // 0..24
     const eg = 24 - phase;
+    const board = chess.board;
     let score = 0;
     for (let sq = 0; sq < 64; sq++) {
-      const p = chess.squares[sq];
+      const p = board[sq];
       if (!p) continue;
+      const t = p & 7, black = p & BLACK;
       // Skip the king PST in lone-king-mate endgames — its middlegame bias
       // (rewards corners, penalizes center) actively fights the mate drive.
-      if (lk && p.t === 'k') continue;
-      const idx = p.c === W ? sq : (sq ^ 56);
-      const mgPst = this.pst[p.t][idx];
-      const egTable = this.pstEnd[p.t];
-      const egPst = egTable ? egTable[idx] : mgPst;
-      const pstVal = ((mgPst * phase + egPst * eg) / 24) | 0;
-      let v = this.pieceValues[p.t] + pstVal;
-      if (p.t === 'p' && this.isPassedPawn(chess, sq, p.c)) {
-        const adv = p.c === W ? (sq >> 3) : 7 - (sq >> 3);
+      if (lk && t === KING) continue;
+      const idx = black ? (sq ^ 56) : sq;
+      const pstVal = ((this.mgTable[t][idx] * phase + this.egTable[t][idx] * eg) / 24) | 0;
+      let v = this.value[t] + pstVal;
+      if (t === PAWN && this.isPassedPawn(chess, sq, black)) {
+        const adv = black ? 7 - (sq >> 3) : (sq >> 3);
         const base = this.passedPawnBonus[adv];
         // Full bonus in pure endgame, 25% at the starting position.
         v += ((base * eg + (base >> 2) * phase) / 24) | 0;
       }
-      score += p.c === W ? v : -v;
+      score += black ? -v : v;
     }
     if (lk) score += this.loneKingMateTerm(chess, lk);
     return chess.turn === W ? score : -score;
@@ -259,22 +360,29 @@ const LorFish = {
 
   quiescence(chess, alpha, beta, qdepth) {
     this.nodes++;
+    if ((this.nodes & 1023) === 0 && this.deadline && performance.now() > this.deadline) throw SEARCH_TIMEOUT;
     if (qdepth > this.maxQ) this.maxQ = qdepth;
 
-    if ((chess.positionCounts.get(chess.positionKey()) || 0) >= 2) return 0;
-    const moves = chess.legalMoves();
-    if (moves.length === 0) return chess.inCheck() ? -99999 : 0;
+    if (chess.repetitionCount() >= 2) return 0;
+    const ply = chess.ply - this.rootPly;
+    const moves = this.moveList(ply);
+    let n = chess.generateMoves(moves);
+    if (!chess.hasLegalMove(moves, n)) return chess.inCheck() ? -99999 : 0;
     if (chess.isInsufficientMaterial()) return 0;
 
     const standPat = this.evaluate(chess);
     if (standPat >= beta) return beta;
     if (standPat > alpha) alpha = standPat;
 
-    const captures = this.orderMoves(chess, moves.filter(m => m.capture || m.enpassant));
-    for (const m of captures) {
-      chess.makeMove(m);
+    let captures = 0;
+    for (let i = 0; i < n; i++) if (moves[i] & MOVE_CAPTURE) moves[captures++] = moves[i];
+    n = captures;
+    this.orderMoves(chess, moves, n, this.scoreLists[ply]);
+    for (let i = 0; i < n; i++) {
+      chess.pushMove(moves[i]);
+      if (chess.movedIntoCheck()) { chess.popMove(); continue; }
       const score = -this.quiescence(chess, -beta, -alpha, qdepth + 1);
-      chess.undoMove();
+      chess.popMove();
       if (score >= beta) return beta;
       if (score > alpha) alpha = score;
     }
@@ -283,13 +391,35 @@ const LorFish = {
 
   negamax(chess, depth, alpha, beta) {
     this.nodes++;
+    if ((this.nodes & 1023) === 0 && this.deadline && performance.now() > this.deadline) throw SEARCH_TIMEOUT;
     // Repetition draw: count >= 2 means the position appears in the actual
     // game history plus the current search line ≥ 2 times — i.e. one more
     // pass through it forces 3-fold. Treat as draw so a winning side avoids
     // it and a losing side can seek it.
-    if ((chess.positionCounts.get(chess.positionKey()) || 0) >= 2) return 0;
-    const moves = chess.legalMoves();
-    if (moves.length === 0) return chess.inCheck() ? (-99999 - depth) : 0;
+    if (chess.repetitionCount() >= 2) return 0;
+
+    // Only non-terminal positions are stored, so a hit can cut before move generation.
+    const alphaOrig = alpha;
+    let ttMove = 0;
+    if (depth > 0) {
+      const i = this.ttProbe(chess);
+      if (i >= 0) {
+        ttMove = this.ttMove[i];
+        const ttScore = this.ttScore[i];
+        if (this.ttDepth[i] >= depth && Math.abs(ttScore) < TT_MATE_THRESHOLD) {
+          const flag = this.ttFlag[i];
+          if (flag === TT_EXACT) return ttScore;
+          if (flag === TT_LOWER && ttScore > alpha) alpha = ttScore;
+          else if (flag === TT_UPPER && ttScore < beta) beta = ttScore;
+          if (alpha >= beta) return ttScore;
+        }
+      }
+    }
+
+    const ply = chess.ply - this.rootPly;
+    const moves = this.moveList(ply);
+    const n = chess.generateMoves(moves);
+    if (!chess.hasLegalMove(moves, n)) return chess.inCheck() ? (-99999 - depth) : 0;
     if (chess.isInsufficientMaterial()) return 0;
     // Check extension: at the horizon, give the side in check one more ply
     // so short forcing mates and quiet replies to checks fall in the window.
@@ -298,48 +428,112 @@ const LorFish = {
       else return this.quiescence(chess, alpha, beta, 0);
     }
 
-    const ordered = this.orderMoves(chess, moves);
+    this.orderMoves(chess, moves, n, this.scoreLists[ply], ttMove);
     let best = -Infinity;
-    for (const m of ordered) {
-      chess.makeMove(m);
+    let bestMove = 0;
+    for (let i = 0; i < n; i++) {
+      const mv = moves[i];
+      chess.pushMove(mv);
+      if (chess.movedIntoCheck()) { chess.popMove(); continue; }
       const v = -this.negamax(chess, depth - 1, -beta, -alpha);
-      chess.undoMove();
-      if (v > best) best = v;
+      chess.popMove();
+      if (v > best) { best = v; bestMove = mv; }
       if (best > alpha) alpha = best;
       if (alpha >= beta) break;
     }
+
+    const flag = best <= alphaOrig ? TT_UPPER : best >= beta ? TT_LOWER : TT_EXACT;
+    this.ttStore(chess, depth, flag, best, bestMove);
     return best;
   },
 
-  getBestMove(chess, depth) {
+  // One iteration over the root moves (already ordered best-first). Moves are
+  // searched with alpha at rootNoiseMargin below the best score so far, so
+  // every move that could win the noisy tiebreak gets an exact score and the
+  // rest only an upper bound. Returns new entries sorted by raw score.
+  searchRoot(chess, rootMoves, depth) {
+    let bestRaw = -Infinity;
+    const results = [];
+    for (const rm of rootMoves) {
+      const alpha = bestRaw - this.rootNoiseMargin;
+      chess.pushMove(rm.mv);
+      const raw = -this.negamax(chess, depth - 1, -Infinity, -alpha);
+      chess.popMove();
+      results.push({ m: rm.m, mv: rm.mv, san: rm.san, raw, exact: raw > alpha });
+      if (raw > bestRaw) bestRaw = raw;
+    }
+    // Stable sort: ties keep the previous iteration's order.
+    results.sort((a, b) => b.raw - a.raw);
+    this.ttStore(chess, depth, TT_EXACT, results[0].raw, results[0].mv);
+    return results;
+  },
+
+  // Iterative deepening. With timeLimitMs > 0 the search deepens until the
+  // time budget runs out and plays the best move of the deepest finished
+  // iteration; otherwise it deepens to the adaptive depth for `depth`.
+  getBestMove(chess, depth, timeLimitMs = 0) {
     this.nodes = 0;
     this.maxQ = 0;
+    this.ttProbes = 0;
+    this.ttHits = 0;
+    if (!this.value) this.initTables();
+    if (!this.ttKey) this.initTT();
+    this.ttGeneration = (this.ttGeneration + 1) & 255;
     const t0 = performance.now();
-    const effDepth = this.adaptiveDepth(chess, depth);
+    const timed = timeLimitMs > 0;
+    const effDepth = timed ? this.maxDepth : this.adaptiveDepth(chess, depth);
+    this.deadline = timed ? t0 + timeLimitMs : 0;
+    this.rootPly = chess.ply;
+
+    const legal = chess.legalMoves();
+    if (legal.length === 0) return null;
+    const rootEntry = this.ttProbe(chess);
+    const moves = this.moveList(0);
+    legal.forEach((m, i) => { moves[i] = encodeMove(m); });
+    this.orderMoves(chess, moves, legal.length, this.scoreLists[0], rootEntry >= 0 ? this.ttMove[rootEntry] : 0);
+    // SAN must be built BEFORE makeMove (needs pre-move state).
+    let rootMoves = Array.from(moves.subarray(0, legal.length), mv => {
+      const m = decodeMove(mv);
+      return { m, mv, san: chess.moveToSan(m), raw: -Infinity, exact: false };
+    });
+    let completed = null;
+    let reached = 0;
+    try {
+      for (let d = 1; d <= effDepth; d++) {
+        rootMoves = this.searchRoot(chess, rootMoves, d);
+        completed = rootMoves;
+        reached = d;
+        if (Math.abs(completed[0].raw) >= 99000) break; // forced mate found
+      }
+    } catch (e) {
+      if (e !== SEARCH_TIMEOUT) throw e;
+      while (chess.ply > this.rootPly) chess.popMove();
+    }
+    this.deadline = 0;
+    if (!completed) return rootMoves[0].m; // not even depth 1 finished
+
     let bestMove = null, bestVal = -Infinity;
-    const moves = this.orderMoves(chess, chess.legalMoves());
     const evals = [];
-    for (const m of moves) {
-      // SAN must be built BEFORE makeMove (needs pre-move state).
-      const san = chess.moveToSan(m);
-      chess.makeMove(m);
-      // Full window at root so logged evals are exact, not pruning bounds.
-      const raw = -this.negamax(chess, effDepth - 1, -Infinity, Infinity);
-      chess.undoMove();
+    for (const e of completed) {
       // Tiny tiebreaker noise so equal-ish moves vary game to game.
       // Skip noise on mate scores so the fastest mate is always chosen.
-      const noise = raw >= 99000 ? 0 : Math.floor(Math.random() * 21) - 10; // -10..+10
-      const v = raw + noise;
-      if (v > bestVal) { bestVal = v; bestMove = m; }
-      evals.push({ san, raw, v });
+      const noise = !e.exact || e.raw >= 99000 ? 0 : Math.floor(Math.random() * 21) - 10; // -10..+10
+      const v = e.raw + noise;
+      if (e.exact && v > bestVal) { bestVal = v; bestMove = e.m; }
+      evals.push({ san: e.san, raw: e.raw, v, exact: e.exact });
     }
     const dt = ((performance.now() - t0) / 1000).toFixed(3);
     evals.sort((a, b) => b.v - a.v);
     const side = chess.turn === W ? 'White' : 'Black';
-    const depthStr = effDepth === depth ? `depth=${depth}` : `depth=${depth} → ${effDepth}`;
+    const depthStr = timed ? `time=${timeLimitMs}ms → depth=${reached}`
+      : effDepth === depth ? `depth=${depth}` : `depth=${depth} → ${effDepth}`;
     console.log(`LorFish evals (${side} to move, ${depthStr}):`);
-    for (const e of evals) console.log(`  ${e.san.padEnd(8)} ${e.v}  [raw=${e.raw}]`);
-    console.log(`nodes=${this.nodes} time=${dt}s maxQ=${this.maxQ}`);
+    for (const e of evals) {
+      if (e.exact) console.log(`  ${e.san.padEnd(8)} ${e.v}  [raw=${e.raw}]`);
+      else console.log(`  ${e.san.padEnd(8)} <=${e.raw}`);
+    }
+    const hitRate = this.ttProbes ? (100 * this.ttHits / this.ttProbes).toFixed(1) : '0.0';
+    console.log(`nodes=${this.nodes} time=${dt}s maxQ=${this.maxQ} tt_hits=${this.ttHits}/${this.ttProbes} (${hitRate}%)`);
     return bestMove;
   },
 };
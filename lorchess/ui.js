@@ -379,28 +379,98 @@ function doHumanMove(move) {
   }
 }
 
+// === Engine worker ===
+// The search runs in a Web Worker so the page keeps painting (and the scanner
+// keeps playing) while LorFish thinks. Each request carries an id; cancelling
+// bumps the id and replaces the worker, so a stale reply is never applied.
+// Pages opened from file:// may not be allowed to start workers — then the
+// search falls back to the main thread as before.
+let engineWorker = null;
+let engineRequestId = 0;
+
+function startEngineWorker() {
+  try {
+    engineWorker = new Worker('engine-worker.js');
+  } catch (e) {
+    console.warn('Web Worker unavailable, searching on the main thread:', e);
+    engineWorker = null;
+    return;
+  }
+  engineWorker.onmessage = onEngineMessage;
+  engineWorker.onerror = e => {
+    console.warn('Engine worker failed, searching on the main thread:', e.message);
+    engineWorker.terminate();
+    engineWorker = null;
+    if (thinking) searchOnMainThread(engineRequestId);
+  };
+}
+
+function cancelEngineSearch() {
+  if (!thinking) return;
+  engineRequestId++;
+  if (engineWorker) {
+    engineWorker.terminate();
+    startEngineWorker();
+  }
+  stopScanner();
+  thinking = false;
+}
+
 function makeEngineMove() {
   if (thinking || chess.isGameOver() || chess.turn === humanColor) return;
   thinking = true;
   render();
   playScanner();
+  const id = ++engineRequestId;
+  if (!engineWorker) {
+    searchOnMainThread(id);
+    return;
+  }
+  engineWorker.postMessage({
+    id,
+    startFen,
+    moves: chess.history.map(h => ({ from: h.move.from, to: h.move.to, promo: h.move.promo || null })),
+    ...selectedSearch(),
+  });
+}
+
+function searchOnMainThread(id) {
   // Defer to next tick so the "thinking" UI paints before we block.
   setTimeout(() => {
-    const depth = parseInt(document.getElementById('depth').value, 10);
-    const move = LorFish.getBestMove(chess, depth);
-    stopScanner();
-    if (move) {
-      const san = chess.moveToSan(move);
-      chess.makeMove(move);
-      lastMove = move;
-      moveHistory.push(san);
-      playMoveSound();
-    }
-    thinking = false;
-    render();
+    if (id !== engineRequestId) return;
+    const { depth, timeMs } = selectedSearch();
+    applyEngineMove(LorFish.getBestMove(chess, depth, timeMs));
   }, 30);
 }
 
+function onEngineMessage(e) {
+  const { id, move } = e.data;
+  if (id !== engineRequestId || !thinking) return;
+  const legal = move && chess.legalMoves().find(m =>
+    m.from === move.from && m.to === move.to && (m.promo || null) === move.promo);
+  applyEngineMove(legal || null);
+}
+
+function applyEngineMove(move) {
+  stopScanner();
+  if (move) {
+    const san = chess.moveToSan(move);
+    chess.makeMove(move);
+    lastMove = move;
+    moveHistory.push(san);
+    playMoveSound();
+  }
+  thinking = false;
+  render();
+}
+
+// "t<N>" options think for N seconds per move; plain numbers are a fixed depth.
+function selectedSearch() {
+  const value = document.getElementById('depth').value;
+  if (value[0] === 't') return { depth: 0, timeMs: parseFloat(value.slice(1)) * 1000 };
+  return { depth: parseInt(value, 10), timeMs: 0 };
+}
+
 function showPromotionDialog() {
   promoOpts.innerHTML = '';
   for (const t of ['q','r','b','n']) {
@@ -421,7 +491,7 @@ function showPromotionDialog() {
 }
 
 function undo() {
-  if (thinking) return;
+  cancelEngineSearch();
   promotionPending = null;
   promoEl.classList.remove('show');
 
@@ -442,6 +512,8 @@ function undo() {
   selected = null;
   legalFromSelected = [];
   render();
+  // Nothing to undo while the engine was thinking (it moves first): restart its search
+  makeEngineMove();
 }
 
 // Initialise the UI for a fresh game. The chess instance must already be in
@@ -456,7 +528,7 @@ function refreshGameState() {
   legalFromSelected = [];
   promotionPending = null;
   promoEl.classList.remove('show');
-  thinking = false;
+  cancelEngineSearch();
   render();
   // If it's not the human's turn, the engine plays.
   if (chess.turn !== humanColor && !chess.isGameOver()) {
@@ -511,4 +583,5 @@ fenLoadBtn.addEventListener('click', () => {
   refreshGameState();
 });
 
+startEngineWorker();
 startNewGame();
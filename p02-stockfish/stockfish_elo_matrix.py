@@ -3,17 +3,129 @@ import chess
 import chess.pgn
 import chess.engine
 import csv
+import json
+import multiprocessing.util
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 
+STOCKFISH_PATH = r"C:\Users\lorand\Programs\stockfish\stockfish-windows-x86-64-avx2.exe"
+NUM_GAMES_PER_PAIR = 100
+RESUME_FROM = None  # path of an existing results CSV to continue; None starts a new experiment
+NUM_WORKERS = os.cpu_count() or 1  # Elo pairs played at once, each by its own pair of engines
+ENGINE_THREADS = 1  # at Limit(time=0.001) extra threads do not help; parallel pairs do
+ENGINE_HASH_MB = 16
+
+FIELDNAMES = ['white_elo', 'black_elo', 'elo_diff', 'num_games', 'white_wins', 'draws', 'black_wins',
+              'white_win_pct', 'draw_pct', 'black_win_pct']
+
 # logging.basicConfig(
 #     filename="uci.log",
 #     level=logging.DEBUG,
 #     filemode="w"
 # )
 
-def play_games_for_elo_pair(engine_white, engine_black, white_elo, black_elo, num_games=100):
-    """Play multiple games for a specific Elo pairing and record results"""
+def checkpoint_path(output_file, white_elo, black_elo):
+    # One checkpoint per pair, so pairs running in different workers never share a file
+    return f"{output_file}.checkpoint_{white_elo}_{black_elo}.json"
+
+
+def save_checkpoint(output_file, white_elo, black_elo, games_played, results):
+    """Record the progress of a pair in play, replacing the file atomically"""
+    state = {'white_elo': white_elo, 'black_elo': black_elo, 'games_played': games_played, **results}
+    path = checkpoint_path(output_file, white_elo, black_elo)
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, path)
+
+
+def load_checkpoint(output_file, white_elo, black_elo):
+    """Return the saved progress of an unfinished pair, or None"""
+    try:
+        with open(checkpoint_path(output_file, white_elo, black_elo)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def remove_checkpoint(output_file, white_elo, black_elo):
+    path = checkpoint_path(output_file, white_elo, black_elo)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def parse_result_row(row):
+    """The row with every column present and numeric, or None for a damaged row"""
+    if None in row:  # more values than columns
+        return None
+    try:
+        for field in FIELDNAMES[:7]:
+            int(row[field])
+        for field in FIELDNAMES[7:]:
+            float(row[field])
+    except (TypeError, ValueError):  # missing column (None) or unparseable value
+        return None
+    return row
+
+
+def load_completed_pairs(output_file):
+    """Read the rows of pairs already finished in a results CSV, keyed by (white_elo, black_elo).
+
+    A crash can leave the last row cut off. A line without a line end, or a row with a
+    missing or unparseable column, is not counted, so the pair is played again. The file
+    is rewritten without such rows, so the next appended row starts on a fresh line.
+    A header other than FIELDNAMES raises ValueError, unless it is a cut-off header alone.
+    """
+    completed = {}
+    if not os.path.exists(output_file):
+        return completed
+    with open(output_file, newline='') as csvfile:
+        lines = csvfile.read().splitlines(keepends=True)
+    damaged = bool(lines) and not lines[-1].endswith('\n')
+    if damaged:
+        lines.pop()
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is not None and reader.fieldnames != FIELDNAMES:
+        # Only a header cut off while it was written, with no rows after it, is dropped; any
+        # other header means the file is not (or no longer) in this format, so leave it alone
+        if len(lines) > 1 or not ','.join(FIELDNAMES).startswith(lines[0].rstrip('\r\n')):
+            raise ValueError(f"{output_file} has columns {reader.fieldnames}, expected {FIELDNAMES}")
+        damaged = True
+        lines.clear()
+    else:
+        for row in reader:
+            row = parse_result_row(row)
+            if row is None:
+                damaged = True
+                continue
+            completed[(int(row['white_elo']), int(row['black_elo']))] = row
+
+    if damaged:
+        print(f"Dropping incomplete rows from {output_file}")
+        tmp_file = output_file + ".tmp"
+        with open(tmp_file, 'w', newline='') as csvfile:
+            if completed:
+                writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+                writer.writeheader()
+                writer.writerows(completed.values())
+        os.replace(tmp_file, output_file)
+    return completed
+
+
+def play_games_for_elo_pair(engine_white, engine_black, white_elo, black_elo, num_games=100,
+                            output_file=None, resume_state=None):
+    """Play multiple games for a specific Elo pairing and record results.
+
+    With output_file set, progress is checkpointed after every game; resume_state
+    (from load_checkpoint) continues an interrupted pairing from its exact game count.
+    """
     results = {'white_wins': 0, 'draws': 0, 'black_wins': 0}
+    start_game = 1
+    if resume_state is not None:
+        for key in results:
+            results[key] = resume_state[key]
+        start_game = resume_state['games_played'] + 1
     
     # Configure engines for this Elo pair
     engine_white.configure({
@@ -27,8 +139,10 @@ def play_games_for_elo_pair(engine_white, engine_black, white_elo, black_elo, nu
     })
     
     print(f"\nPlaying {num_games} games: White Elo {white_elo} vs Black Elo {black_elo}")
+    if start_game > 1:
+        print(f"  Resuming after game {start_game - 1}")
     
-    for game_num in range(1, num_games + 1):
+    for game_num in range(start_game, num_games + 1):
         board = chess.Board()
         
         # Play the game
@@ -50,88 +164,142 @@ def play_games_for_elo_pair(engine_white, engine_black, white_elo, black_elo, nu
         else:
             results['draws'] += 1
         
+        if output_file is not None:
+            save_checkpoint(output_file, white_elo, black_elo, game_num, results)
+        
         if game_num % 10 == 0:
-            print(f"  Progress: {game_num}/{num_games} games completed")
+            print(f"  {white_elo} vs {black_elo} progress: {game_num}/{num_games} games completed")
     
     # Print summary for this pairing
-    print(f"  Results - W:{results['white_wins']} D:{results['draws']} L:{results['black_wins']}")
+    print(f"  {white_elo} vs {black_elo} results - "
+          f"W:{results['white_wins']} D:{results['draws']} L:{results['black_wins']}")
     
     return results
 
 
-def run_elo_matrix_experiment():
-    """Run games across all Elo combinations with difference <= 400"""
+def open_engines(threads=ENGINE_THREADS, hash_mb=ENGINE_HASH_MB):
+    """Start a white and a black engine process"""
+    engines = []
+    for _ in range(2):
+        engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
+        engine.configure({"Threads": threads, "Hash": hash_mb})
+        engines.append(engine)
+    return engines
+
+
+# Engines owned by the current worker process, created once by init_worker
+worker_engines = None
+
+
+def init_worker():
+    global worker_engines
+    worker_engines = open_engines()
+    # Pool workers exit without running atexit handlers, so register the cleanup with multiprocessing
+    for engine in worker_engines:
+        multiprocessing.util.Finalize(engine, engine.quit, exitpriority=10)
+
+
+def play_pair_job(white_elo, black_elo, num_games, output_file, resume_state):
+    engine_white, engine_black = worker_engines
+    results = play_games_for_elo_pair(engine_white, engine_black, white_elo, black_elo, num_games=num_games,
+                                      output_file=output_file, resume_state=resume_state)
+    return white_elo, black_elo, results
+
+
+def make_result_row(white_elo, black_elo, results, total_games):
+    """Build the CSV row for a finished pair"""
+    # Calculate percentages
+    white_win_pct = results['white_wins'] / total_games * 100
+    draw_pct = results['draws'] / total_games * 100
+    black_win_pct = results['black_wins'] / total_games * 100
     
-    # Initialize engines
-    engine_white = chess.engine.SimpleEngine.popen_uci(r"C:\Users\lorand\Programs\stockfish\stockfish-windows-x86-64-avx2.exe")
-    engine_black = chess.engine.SimpleEngine.popen_uci(r"C:\Users\lorand\Programs\stockfish\stockfish-windows-x86-64-avx2.exe")
-    engine_white.configure({"Threads": 10, "Hash": 1024})
-    engine_black.configure({"Threads": 10, "Hash": 1024})
+    return {
+        'white_elo': white_elo,
+        'black_elo': black_elo,
+        'elo_diff': white_elo - black_elo,
+        'num_games': total_games,
+        'white_wins': results['white_wins'],
+        'draws': results['draws'],
+        'black_wins': results['black_wins'],
+        'white_win_pct': f"{white_win_pct:.1f}",
+        'draw_pct': f"{draw_pct:.1f}",
+        'black_win_pct': f"{black_win_pct:.1f}"
+    }
+
+
+def run_elo_matrix_experiment(resume_from=RESUME_FROM, num_games=NUM_GAMES_PER_PAIR, num_workers=NUM_WORKERS):
+    """Run games across all Elo combinations with difference <= 400.
+
+    Pairs are spread over num_workers processes, each with its own single-threaded
+    white and black engine; only this process writes the CSV.
+    With resume_from set to an earlier results CSV, finished pairs are skipped,
+    interrupted pairs continue from their checkpoints and new rows are appended to that file.
+    """
     
     # Elo range: 1500 to 2800 by 100
     elo_values = list(range(1500, 2900, 100))
     
     # Prepare results storage
-    all_results = []
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"elo_matrix_results_{timestamp}.csv"
+    if resume_from is not None:
+        output_file = resume_from
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = f"elo_matrix_results_{timestamp}.csv"
+    completed_pairs = load_completed_pairs(output_file)
+    all_results = list(completed_pairs.values())
+    
+    # All Elo combinations with absolute difference <= 400 that still need games
+    all_pairs = [(w, b) for w in elo_values for b in elo_values if abs(w - b) <= 400]
+    pending_pairs = [pair for pair in all_pairs if pair not in completed_pairs]
     
-    # Open CSV file for writing
-    with open(output_file, 'w', newline='') as csvfile:
-        fieldnames = ['white_elo', 'black_elo', 'elo_diff', 'num_games', 'white_wins', 'draws', 'black_wins', 
-                      'white_win_pct', 'draw_pct', 'black_win_pct']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
+    # Open CSV file for appending, so a resumed run keeps the rows already written
+    write_header = not completed_pairs and (not os.path.exists(output_file) or os.path.getsize(output_file) == 0)
+    with open(output_file, 'a', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        if write_header:
+            writer.writeheader()
+            csvfile.flush()
         
-        total_combinations = sum(1 for w in elo_values for b in elo_values if abs(w - b) <= 400)
-        completed = 0
+        total_combinations = len(all_pairs)
+        completed = len(completed_pairs)
         
         print(f"Starting Elo matrix experiment")
         print(f"Total combinations to test: {total_combinations}")
+        if completed:
+            print(f"Resuming: {completed} combinations already completed")
+        print(f"Running {num_workers} engine pairs in parallel")
         print(f"Results will be saved to: {output_file}")
         print("="*70)
         
-        # Loop through all Elo combinations
-        for white_elo in elo_values:
-            for black_elo in elo_values:
-                # Check if absolute difference is <= 400
-                elo_diff = white_elo - black_elo
-                if abs(elo_diff) <= 400:
-                    # Play 100 games for this combination
-                    results = play_games_for_elo_pair(engine_white, engine_black, 
-                                                      white_elo, black_elo, num_games=100)
-                    
-                    # Calculate percentages
-                    total_games = 100
-                    white_win_pct = results['white_wins'] / total_games * 100
-                    draw_pct = results['draws'] / total_games * 100
-                    black_win_pct = results['black_wins'] / total_games * 100
-                    
-                    # Store results
-                    result_row = {
-                        'white_elo': white_elo,
-                        'black_elo': black_elo,
-                        'elo_diff': elo_diff,
-                        'num_games': total_games,
-                        'white_wins': results['white_wins'],
-                        'draws': results['draws'],
-                        'black_wins': results['black_wins'],
-                        'white_win_pct': f"{white_win_pct:.1f}",
-                        'draw_pct': f"{draw_pct:.1f}",
-                        'black_win_pct': f"{black_win_pct:.1f}"
-                    }
-                    
-                    writer.writerow(result_row)
-                    csvfile.flush()  # Ensure data is written immediately
-                    all_results.append(result_row)
-                    
-                    completed += 1
-                    print(f"\nProgress: {completed}/{total_combinations} combinations completed ({completed/total_combinations*100:.1f}%)")
-                    print("="*70)
+        def record_pair(white_elo, black_elo, results):
+            nonlocal completed
+            result_row = make_result_row(white_elo, black_elo, results, num_games)
+            writer.writerow(result_row)
+            csvfile.flush()  # Ensure data is written immediately
+            remove_checkpoint(output_file, white_elo, black_elo)  # the finished pair no longer needs it
+            all_results.append(result_row)
+            
+            completed += 1
+            print(f"\nProgress: {completed}/{total_combinations} combinations completed ({completed/total_combinations*100:.1f}%)")
+            print("="*70)
         
-    # Clean up
-    engine_white.quit()
-    engine_black.quit()
+        if num_workers <= 1:
+            engine_white, engine_black = open_engines()
+            for white_elo, black_elo in pending_pairs:
+                results = play_games_for_elo_pair(engine_white, engine_black, white_elo, black_elo,
+                                                  num_games=num_games, output_file=output_file,
+                                                  resume_state=load_checkpoint(output_file, white_elo, black_elo))
+                record_pair(white_elo, black_elo, results)
+            # Clean up
+            engine_white.quit()
+            engine_black.quit()
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker) as pool:
+                futures = [pool.submit(play_pair_job, white_elo, black_elo, num_games, output_file,
+                                       load_checkpoint(output_file, white_elo, black_elo))
+                           for white_elo, black_elo in pending_pairs]
+                for future in as_completed(futures):
+                    record_pair(*future.result())
     
     print(f"\nExperiment completed!")
     print(f"All results saved to: {output_file}")
@@ -8,9 +8,19 @@ DEFAULT_SIMPLE_ENGINE_DEPTH = 6
 DEFAULT_STOCKFISH_ELO = 1320
 DEFAULT_NUM_GAMES = 10
 
+# SPRT early stopping: play up to num_games but stop once SimpleEngine is shown to be
+# SPRT_ELO0 or SPRT_ELO1 Elo stronger than this Stockfish setting
+USE_SPRT = False
+SPRT_ELO0 = 0
+SPRT_ELO1 = 50
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
+
 # Add parent directory to path to import simple_engine
 sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "p04-lorfish"))  # sprt.py is shared with LorFish
 from simple_engine import SimpleEngine
+from sprt import SPRT
 
 
 def play_game(simple_engine, stockfish_engine, simple_plays_white=True):
@@ -42,8 +52,13 @@ def play_game(simple_engine, stockfish_engine, simple_plays_white=True):
     return board.result()
 
 
-def play_match(simple_depth=DEFAULT_SIMPLE_ENGINE_DEPTH, stockfish_elo=DEFAULT_STOCKFISH_ELO, num_games=DEFAULT_NUM_GAMES):
-    """Play a match of multiple games between SimpleEngine and Stockfish"""
+def play_match(simple_depth=DEFAULT_SIMPLE_ENGINE_DEPTH, stockfish_elo=DEFAULT_STOCKFISH_ELO, num_games=DEFAULT_NUM_GAMES,
+               sprt=None):
+    """Play a match of multiple games between SimpleEngine and Stockfish.
+
+    With an SPRT, the match stops as soon as the test accepts one of its hypotheses.
+    Games 2k-1 and 2k form a colour-swapped pair for pentanomial scoring.
+    """
     
     print(f"SimpleEngine (depth {simple_depth}) vs Stockfish (Elo {stockfish_elo}) - {num_games} games\n")
     
@@ -66,6 +81,7 @@ def play_match(simple_depth=DEFAULT_SIMPLE_ENGINE_DEPTH, stockfish_elo=DEFAULT_S
     draws = 0
     
     # Play games
+    games_played = 0
     for game_num in range(1, num_games + 1):
         simple_plays_white = (game_num % 2 == 1)
         result = play_game(simple_engine, stockfish, simple_plays_white)
@@ -74,29 +90,51 @@ def play_match(simple_depth=DEFAULT_SIMPLE_ENGINE_DEPTH, stockfish_elo=DEFAULT_S
         if result == "1-0":
             if simple_plays_white:
                 simple_wins += 1
+                game_score = 1
             else:
                 stockfish_wins += 1
+                game_score = 0
         elif result == "0-1":
             if simple_plays_white:
                 stockfish_wins += 1
+                game_score = 0
             else:
                 simple_wins += 1
+                game_score = 1
         else:
             draws += 1
+            game_score = 0.5
+        games_played += 1
         
-        print(f"Game {game_num}: {result}")
+        if sprt is None:
+            print(f"Game {game_num}: {result}")
+        else:
+            sprt.add_game(game_score, pair_index=(game_num - 1) // 2)
+            print(f"Game {game_num}: {result}  {sprt.summary()}")
+            if sprt.status() is not None:
+                break
     
     stockfish.quit()
     
     # Print summary
     score = simple_wins + draws * 0.5
-    print(f"\nSimpleEngine: {simple_wins}W {draws}D {stockfish_wins}L (Score: {score}/{num_games})")
-    print(f"Win rate: {simple_wins/num_games*100:.1f}%\n")
+    print(f"\nSimpleEngine: {simple_wins}W {draws}D {stockfish_wins}L (Score: {score}/{games_played})")
+    print(f"Win rate: {simple_wins/games_played*100:.1f}%\n")
+    if sprt is not None:
+        status = sprt.status()
+        if status == "H1":
+            verdict = f"H1 accepted: SimpleEngine is about {sprt.elo1:+} Elo or more"
+        elif status == "H0":
+            verdict = f"H0 accepted: SimpleEngine is about {sprt.elo0:+} Elo or less"
+        else:
+            verdict = "inconclusive"
+        print(f"SPRT({sprt.elo0}, {sprt.elo1}) {sprt.summary()}  {verdict}")
 
 
 if __name__ == "__main__":
     play_match(
         simple_depth=DEFAULT_SIMPLE_ENGINE_DEPTH,
         stockfish_elo=DEFAULT_STOCKFISH_ELO,
-        num_games=DEFAULT_NUM_GAMES
+        num_games=DEFAULT_NUM_GAMES,
+        sprt=SPRT(SPRT_ELO0, SPRT_ELO1, SPRT_ALPHA, SPRT_BETA) if USE_SPRT else None
     )
@@ -0,0 +1,187 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import chess
+
+# Benchmark for the Python engines: fixed FEN suite at fixed depths, plus perft.
+#
+#   python benchmark.py                         LorFish, depth 3, results to stdout
+#   python benchmark.py --engine simple -d 4    SimpleEngine from p03-UI
+#   python benchmark.py -o after.json --compare before.json
+#   python benchmark.py --perft -d 4            move generation only, checked against known counts
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "p03-UI"))
+from lorfish import LorFish
+from simple_engine import SimpleEngine
+
+DEFAULT_DEPTH = 3
+
+# Search suite: the start position, the test positions from ui-human_vs_lorfish.py, and some middlegames
+SEARCH_POSITIONS = [
+    ("startpos", chess.STARTING_FEN),
+    ("pawn_race", "7k/7p/6Pp/8/8/7P/7P/7K b - - 0 1"),
+    ("bishop_pair_vs_knight", "rnb1k3/ppp5/8/3N4/7b/2p5/6P1/6RK b - - 0 8"),
+    ("two_queens_mate", "6k1/6q1/6q1/8/8/8/8/7K w - - 24 13"),
+    ("french_advance", "r1b1k1nr/pp3ppp/1q2p3/3pP3/1b1N4/N7/PP1B1PPP/R2QKB1R b KQkq - 0 9"),
+    ("double_promotion", "7k/2PP4/8/8/8/8/8/2K5 w - - 0 1"),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("italian", "r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/2NP1N2/PPP2PPP/R1BQK2R b KQkq - 0 5"),
+]
+
+# Perft suite with known node counts per depth (from the Chess Programming Wiki)
+PERFT_POSITIONS = [
+    ("startpos", chess.STARTING_FEN, [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333]),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+]
+
+
+def make_engine(engine_name, depth):
+    if engine_name == "lorfish":
+        return LorFish(depth=depth, verbose=False)
+    return SimpleEngine(depth=depth)
+
+
+def search_position(engine_name, fen, max_depth):
+    """Search fen with a fresh engine at every depth up to max_depth; the last depth gives nodes and best move"""
+    time_to_depth = {}
+    for depth in range(1, max_depth + 1):
+        engine = make_engine(engine_name, depth)
+        board = chess.Board(fen)
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # SimpleEngine always prints its statistics
+            best_move = engine.get_best_move(board)
+        elapsed = time.perf_counter() - start_time
+        time_to_depth[str(depth)] = round(elapsed, 4)
+
+    return {
+        "nodes": engine.nodes_visited,
+        "time": round(elapsed, 4),
+        "nps": round(engine.nodes_visited / elapsed) if elapsed > 0 else 0,
+        "time_to_depth": time_to_depth,
+        "best_move": best_move.uci() if best_move else None,
+    }
+
+
+def perft(board, depth):
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return board.legal_moves.count()
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+def run_search_suite(engine_name, depth):
+    results = []
+    for name, fen in SEARCH_POSITIONS:
+        result = {"name": name, "fen": fen, "depth": depth, **search_position(engine_name, fen, depth)}
+        print(f"{name:24s} nodes={result['nodes']:8d}  time={result['time']:8.3f}s  "
+              f"nps={result['nps']:7d}  best={result['best_move']}")
+        results.append(result)
+    return results
+
+
+def run_perft_suite(depth):
+    results = []
+    for name, fen, expected_counts in PERFT_POSITIONS:
+        board = chess.Board(fen)
+        start_time = time.perf_counter()
+        nodes = perft(board, depth)
+        elapsed = time.perf_counter() - start_time
+        expected = expected_counts[depth - 1] if depth <= len(expected_counts) else None
+        result = {
+            "name": name,
+            "fen": fen,
+            "depth": depth,
+            "nodes": nodes,
+            "expected": expected,
+            "ok": expected is None or nodes == expected,
+            "time": round(elapsed, 4),
+            "nps": round(nodes / elapsed) if elapsed > 0 else 0,
+        }
+        status = "ok" if expected is None or nodes == expected else f"MISMATCH (expected {expected})"
+        print(f"{name:24s} perft({depth})={nodes:9d}  time={elapsed:8.3f}s  nps={result['nps']:8d}  {status}")
+        results.append(result)
+    return results
+
+
+def compare(results, baseline):
+    """Print per-position speed change against an earlier benchmark JSON"""
+    baseline_by_name = {p["name"]: p for p in baseline["positions"]}
+    print(f"\nCompared with {baseline.get('label', 'baseline')}:")
+    for p in results["positions"]:
+        old = baseline_by_name.get(p["name"])
+        if old is None or not old["nps"] or not old["time"]:
+            continue
+        moved = "" if old.get("best_move") == p.get("best_move") else f"  best move {old.get('best_move')} -> {p.get('best_move')}"
+        print(f"{p['name']:24s} nps {old['nps']:8d} -> {p['nps']:8d} ({(p['nps'] / old['nps'] - 1) * 100:+6.1f}%)  "
+              f"nodes {old['nodes']} -> {p['nodes']}{moved}")
+    if baseline.get("nps"):
+        print(f"{'total':24s} nps {baseline['nps']:8d} -> {results['nps']:8d} "
+              f"({(results['nps'] / baseline['nps'] - 1) * 100:+6.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LorFish / SimpleEngine on a fixed position suite")
+    parser.add_argument("--engine", choices=["lorfish", "simple"], default="lorfish")
+    parser.add_argument("-d", "--depth", type=int, default=DEFAULT_DEPTH)
+    parser.add_argument("--perft", action="store_true", help="run perft instead of the search suite")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--label", help="name for this run in the JSON, e.g. a commit hash")
+    parser.add_argument("--compare", help="earlier JSON output to compare against")
+    args = parser.parse_args()
+
+    if args.perft:
+        positions = run_perft_suite(args.depth)
+        mode = "perft"
+    else:
+        positions = run_search_suite(args.engine, args.depth)
+        mode = "search"
+
+    total_nodes = sum(p["nodes"] for p in positions)
+    total_time = sum(p["time"] for p in positions)
+    results = {
+        "label": args.label,
+        "mode": mode,
+        "engine": None if args.perft else args.engine,
+        "depth": args.depth,
+        "python": platform.python_version(),
+        "chess": chess.__version__,
+        "total_nodes": total_nodes,
+        "total_time": round(total_time, 4),
+        "nps": round(total_nodes / total_time) if total_time > 0 else 0,
+        "positions": positions,
+    }
+    print(f"\nTotal: nodes={total_nodes}  time={total_time:.3f}s  nps={results['nps']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+    if args.perft and not all(p["ok"] for p in positions):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
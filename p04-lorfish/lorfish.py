@@ -1,4 +1,5 @@
 import chess
+import chess.polyglot
 import math
 import time
 
@@ -6,9 +7,96 @@ import time
 ## 2      ~1400     LorFish vs Stockfish 1400: 47W 17D 36L (Score: 55.5/100)
 ## 4      ~1800     LorFish vs Stockfish 1800: 43W 17D 40L  Score: 51.5/100
 
+# Transposition table bound types
+EXACT = 0
+LOWERBOUND = 1  # true score >= stored score (beta cutoff)
+UPPERBOUND = 2  # true score <= stored score (failed low)
+
+# Scores beyond this are mate scores; they depend on the remaining depth so they are not reused from the TT
+MATE_THRESHOLD = 90000
+
+MAX_SEARCH_DEPTH = 64  # iterative deepening ceiling when searching on a time limit
+TIME_CHECK_INTERVAL = 256  # nodes between clock checks
+
+# Quiet move ordering: killer moves score below every capture (MVV-LVA >= 991), history below the killers
+KILLER_SCORES = (900, 800)  # first and second killer slot of a ply
+HISTORY_MAX = 700  # the history table is halved whenever an entry would pass this
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the deadline passes or the search is cancelled"""
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results keyed on the Zobrist hash of the position.
+
+    Each slot holds a tuple (key, depth, flag, score, best_move, generation).
+    Replacement policies:
+      "depth"  - keep the deeper entry, but always overwrite entries left over from an older search
+      "always" - every store overwrites the slot
+    """
+    ENTRY_BYTES = 150  # rough size of one entry tuple plus its slot pointer in CPython
+
+    def __init__(self, size_mb=64, replacement="depth"):
+        if replacement not in ("depth", "always"):
+            raise ValueError(f"Unknown replacement policy: {replacement}")
+        self.size = max(1, int(size_mb * 1024 * 1024) // self.ENTRY_BYTES)
+        self.replacement = replacement
+        self.table = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self):
+        self.table = [None] * self.size
+        self.generation = 0
+
+    def new_search(self):
+        """Start a new search: bump the generation and reset the hit statistics"""
+        self.generation += 1
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key):
+        self.probes += 1
+        entry = self.table[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, flag, score, best_move):
+        index = key % self.size
+        old = self.table[index]
+        if (self.replacement == "depth" and old is not None and old[0] != key
+                and old[5] == self.generation and old[1] > depth):
+            return
+        self.table[index] = (key, depth, flag, score, best_move, self.generation)
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
 class LorFish:
-    def __init__(self, depth):
+    def __init__(self, depth, tt_size_mb=64, tt_replacement="depth", verbose=True, debug_eval=False, book=None):
         self.depth = depth
+        self.book = book  # opening_book.OpeningBook consulted by get_best_move before searching
+        self.verbose = verbose  # print search statistics after every move
+        self.debug_eval = debug_eval  # cross-check the incremental evaluation against evaluate() at every node
+        self.tt = TranspositionTable(size_mb=tt_size_mb, replacement=tt_replacement)
+        self.deadline = None
+        self.stop_event = None  # threading.Event that cancels the running search when set
+        self.nodes_visited = 0
+        self.max_quiescence_depth = 0
+
+        # Quiet moves that caused a beta cutoff: two killer slots per ply from the root, and a
+        # butterfly history table indexed [color * 4096 + from * 64 + to] weighted by depth squared
+        self.killers = []
+        self.history = [0] * (2 * 64 * 64)
+        self.root_ply = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.cutoff_index_sum = 0
 
         # Basic piece values (centipawns)
         # from https://github.com/thomasahle/sunfish
@@ -80,9 +168,27 @@ class LorFish:
                  4,  54,  47, -99, -99,  60,  83, -62),
         }
 
-    def order_moves(self, board, moves):
-        """Order moves to improve alpha-beta pruning (MVV-LVA, checks, promotions)"""
+        # Signed material + PST value of each piece on each square (white positive),
+        # indexed [color][piece_type][square], for the incremental evaluation
+        self.square_values = [[None] * 7, [None] * 7]
+        for piece_type, table in self.pst.items():
+            self.square_values[chess.WHITE][piece_type] = tuple(
+                self.piece_values[piece_type] + table[sq] for sq in chess.SQUARES)
+            self.square_values[chess.BLACK][piece_type] = tuple(
+                -(self.piece_values[piece_type] + table[chess.square_mirror(sq)]) for sq in chess.SQUARES)
+        self.eval_stack = []
+
+    def order_moves(self, board, moves, tt_move=None, ply=None):
+        """Order moves to improve alpha-beta pruning (TT move, MVV-LVA, checks, promotions).
+
+        With ply, quiet moves are ordered by the killer slots of that ply, then the history table.
+        """
+        killers = self.killers[ply] if ply is not None and ply < len(self.killers) else ()
+        history_base = 0 if board.turn == chess.WHITE else 4096
+
         def move_score(move):
+            if move == tt_move:
+                return 100000
             score = 0
             if board.is_capture(move):
                 victim = board.piece_at(move.to_square)
@@ -90,6 +196,11 @@ class LorFish:
                 if victim and attacker:
                     score += self.piece_values.get(victim.piece_type, 0) * 10
                     score -= self.piece_values.get(attacker.piece_type, 0) // 100
+            elif ply is not None and not move.promotion:
+                if move in killers:
+                    score += KILLER_SCORES[killers.index(move)]
+                else:
+                    score += self.history[history_base + move.from_square * 64 + move.to_square]
             if move.promotion:
                 score += 8000
             if board.gives_check(move):
@@ -98,13 +209,37 @@ class LorFish:
 
         return sorted(moves, key=move_score, reverse=True)
 
-    def evaluate(self, board, depth=0):
-        """Evaluate position from the current player's perspective"""
-        if board.is_checkmate():
-            return -99999 - depth  # current player is checkmated
-        if board.is_stalemate() or board.is_insufficient_material():
-            return 0
+    def record_cutoff(self, board, move, depth, ply, index):
+        """Update the cutoff statistics, and the killers and history if move is quiet (board is before move)"""
+        self.cutoffs += 1
+        self.cutoff_index_sum += index
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if board.is_capture(move) or move.promotion:
+            return
+
+        while len(self.killers) <= ply:
+            self.killers.append([None, None])
+        slots = self.killers[ply]
+        if slots[0] != move:
+            slots[1] = slots[0]
+            slots[0] = move
+
+        entry = (0 if board.turn == chess.WHITE else 4096) + move.from_square * 64 + move.to_square
+        self.history[entry] += depth * depth
+        if self.history[entry] > HISTORY_MAX:
+            self.history = [value // 2 for value in self.history]
 
+    def first_move_cutoff_rate(self):
+        """Share of beta cutoffs caused by the first move searched, for the last search"""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    def average_cutoff_index(self):
+        """Mean position (0 = first) of the move that caused a beta cutoff, for the last search"""
+        return self.cutoff_index_sum / self.cutoffs if self.cutoffs else 0.0
+
+    def material_pst(self, board):
+        """Material + PST balance of the whole board from White's perspective"""
         score = 0
         for square in chess.SQUARES:
             piece = board.piece_at(square)
@@ -113,18 +248,95 @@ class LorFish:
             sq = square if piece.color == chess.WHITE else chess.square_mirror(square)
             value = self.piece_values[piece.piece_type] + self.pst[piece.piece_type][sq]
             score += value if piece.color == chess.WHITE else -value
+        return score
+
+    def evaluate(self, board, depth=0):
+        """Evaluate position from the current player's perspective"""
+        if board.is_checkmate():
+            return -99999 - depth  # current player is checkmated
+        if board.is_stalemate() or board.is_insufficient_material():
+            return 0
+
+        score = self.material_pst(board)
+        return score if board.turn == chess.WHITE else -score
+
+    # Incremental evaluation: the search keeps a stack of White-perspective material + PST
+    # scores in step with the board, pushing a delta per move instead of rescanning 64 squares.
+
+    def reset_eval(self, board):
+        """Start incremental evaluation from the given position"""
+        self.eval_stack = [self.material_pst(board)]
+
+    def move_delta(self, board, move):
+        """Change in the White-perspective material + PST score caused by move (before it is pushed)"""
+        values = self.square_values
+        piece = board.piece_at(move.from_square)
+        color = piece.color
+        delta = (values[color][move.promotion or piece.piece_type][move.to_square]
+                 - values[color][piece.piece_type][move.from_square])
+
+        if board.is_en_passant(move):
+            captured_square = move.to_square - 8 if color == chess.WHITE else move.to_square + 8
+            delta -= values[not color][chess.PAWN][captured_square]
+        else:
+            captured = board.piece_at(move.to_square)
+            if captured is not None:
+                delta -= values[captured.color][captured.piece_type][move.to_square]
 
+        if piece.piece_type == chess.KING and board.is_castling(move):
+            rank_start = move.from_square - chess.square_file(move.from_square)
+            if chess.square_file(move.to_square) > chess.square_file(move.from_square):
+                rook_from, rook_to = rank_start + 7, rank_start + 5
+            else:
+                rook_from, rook_to = rank_start, rank_start + 3
+            delta += values[color][chess.ROOK][rook_to] - values[color][chess.ROOK][rook_from]
+
+        return delta
+
+    def push(self, board, move):
+        self.eval_stack.append(self.eval_stack[-1] + self.move_delta(board, move))
+        board.push(move)
+
+    def pop(self, board):
+        board.pop()
+        self.eval_stack.pop()
+
+    def incremental_score(self, board):
+        """Material + PST from the current player's perspective, read from the incremental stack"""
+        score = self.eval_stack[-1]
+        if self.debug_eval:
+            expected = self.material_pst(board)
+            if score != expected:
+                raise AssertionError(f"Incremental eval {score} != full eval {expected} in {board.fen()}")
         return score if board.turn == chess.WHITE else -score
 
+    def static_eval(self, board, depth=0):
+        """Same result as evaluate(), using the incremental material + PST score"""
+        if board.is_checkmate():
+            return -99999 - depth  # current player is checkmated
+        if board.is_stalemate() or board.is_insufficient_material():
+            return 0
+        return self.incremental_score(board)
+
+    def check_time(self):
+        if self.nodes_visited % TIME_CHECK_INTERVAL != 0:
+            return
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise SearchTimeout()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchTimeout()
+
     def quiescence(self, board, alpha, beta, qdepth=0):
         self.nodes_visited += 1
+        self.check_time()
         if qdepth > self.max_quiescence_depth:
             self.max_quiescence_depth = qdepth
 
         if board.is_game_over():
-            return self.evaluate(board)
+            return self.static_eval(board)
 
-        stand_pat = self.evaluate(board)
+        # The game is not over, so the terminal checks in evaluate() cannot trigger
+        stand_pat = self.incremental_score(board)
         if stand_pat >= beta:
             return beta
         if stand_pat > alpha:
@@ -132,9 +344,9 @@ class LorFish:
 
         captures = self.order_moves(board, [m for m in board.legal_moves if board.is_capture(m)])
         for move in captures:
-            board.push(move)
+            self.push(board, move)
             score = -self.quiescence(board, -beta, -alpha, qdepth + 1)
-            board.pop()
+            self.pop(board)
             if score >= beta:
                 return beta
             if score > alpha:
@@ -144,43 +356,180 @@ class LorFish:
 
     def negamax(self, board, depth, alpha, beta):
         self.nodes_visited += 1
+        self.check_time()
 
         if board.is_game_over():
-            return self.evaluate(board, depth)
+            return self.static_eval(board, depth)
         if depth == 0:
             return self.quiescence(board, alpha, beta)
 
-        moves = self.order_moves(board, list(board.legal_moves))
+        key = chess.polyglot.zobrist_hash(board)
+        alpha_orig = alpha
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            _, tt_depth, tt_flag, tt_score, tt_move, _ = entry
+            if tt_depth >= depth and abs(tt_score) < MATE_THRESHOLD:
+                if tt_flag == EXACT:
+                    return tt_score
+                if tt_flag == LOWERBOUND:
+                    alpha = max(alpha, tt_score)
+                elif tt_flag == UPPERBOUND:
+                    beta = min(beta, tt_score)
+                if alpha >= beta:
+                    return tt_score
+
+        ply = len(board.move_stack) - self.root_ply
+        moves = self.order_moves(board, list(board.legal_moves), tt_move, ply)
 
         best = -math.inf
-        for move in moves:
-            board.push(move)
-            best = max(best, -self.negamax(board, depth - 1, -beta, -alpha))
-            board.pop()
+        best_move = None
+        for index, move in enumerate(moves):
+            self.push(board, move)
+            score = -self.negamax(board, depth - 1, -beta, -alpha)
+            self.pop(board)
+            if score > best:
+                best = score
+                best_move = move
             alpha = max(alpha, best)
             if alpha >= beta:
+                self.record_cutoff(board, move, depth, ply, index)
                 break
+
+        if best <= alpha_orig:
+            flag = UPPERBOUND
+        elif best >= beta:
+            flag = LOWERBOUND
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, flag, best, best_move)
         return best
 
-    def get_best_move(self, board):
-        self.nodes_visited = 0
-        self.max_quiescence_depth = 0
-        start_time = time.time()
+    def get_pv(self, board, max_length):
+        """Follow best moves stored in the TT to recover the principal variation"""
+        pv = []
+        seen = set()
+        for _ in range(max_length):
+            key = chess.polyglot.zobrist_hash(board)
+            entry = self.tt.probe(key)
+            if entry is None or entry[4] is None or key in seen or not board.is_legal(entry[4]):
+                break
+            seen.add(key)
+            pv.append(entry[4])
+            board.push(entry[4])
+        for _ in pv:
+            board.pop()
+        return pv
+
+    def search_root(self, board, depth, first_move=None, multipv=1):
+        """Search all root moves to the given depth, trying first_move first.
+
+        Each move is searched with alpha set to the multipv-th best score so far, so the
+        top multipv moves get exact scores and the rest only upper bounds.
+        Returns (best_move, best_value, root_moves) with root_moves a list of
+        (move, score, exact) sorted best first.
+        Stores (move, value) in self.root_best as soon as a root move improves on the best,
+        so a timed-out iteration can still report the best fully searched move.
+        """
         best_move = None
         best_value = -math.inf
-        alpha = -math.inf
         beta = math.inf
+        root_moves = []
+        top_scores = []  # best multipv scores so far, descending
 
-        for move in self.order_moves(board, list(board.legal_moves)):
-            board.push(move)
-            value = -self.negamax(board, self.depth - 1, -beta, -alpha)
-            board.pop()
+        for move in self.order_moves(board, list(board.legal_moves), first_move, 0):
+            alpha = top_scores[-1] if len(top_scores) >= multipv else -math.inf
+            self.push(board, move)
+            value = -self.negamax(board, depth - 1, -beta, -alpha)
+            self.pop(board)
 
+            root_moves.append((move, value, value > alpha))
+            if value > alpha:
+                top_scores = sorted(top_scores + [value], reverse=True)[:multipv]
             if value > best_value:
                 best_value = value
                 best_move = move
-            alpha = max(alpha, value)
+                self.root_best = (best_move, best_value)
+
+        root_moves.sort(key=lambda item: item[1], reverse=True)
+        return best_move, best_value, root_moves
+
+    def analyze(self, board, top_k=1, time_limit=None, max_depth=None, stop_event=None):
+        """Find the best move with iterative deepening and score the root moves in the same search.
+
+        Returns (best_move, root_moves): root_moves is a list of (move, score, exact) sorted
+        best first, from the current player's perspective. The top_k moves have exact scores;
+        the others are upper bounds. top_k=None scores every root move exactly.
+
+        Without a time limit the search deepens to max_depth (default self.depth).
+        With time_limit (seconds) it deepens until the deadline, up to max_depth
+        (default MAX_SEARCH_DEPTH), and reports the deepest finished iteration.
+        Setting stop_event (a threading.Event) from another thread ends the search the same way.
+        """
+        self.nodes_visited = 0
+        self.max_quiescence_depth = 0
+        self.tt.new_search()
+        self.root_ply = len(board.move_stack)
+        self.killers = []  # killers belong to plies of one search; history carries over, aged
+        self.history = [value // 2 for value in self.history]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.cutoff_index_sum = 0
+        start_time = time.time()
+        if max_depth is None:
+            max_depth = self.depth if time_limit is None else MAX_SEARCH_DEPTH
+        self.deadline = start_time + time_limit if time_limit is not None else None
+        self.stop_event = stop_event
+        multipv = top_k if top_k is not None else board.legal_moves.count()
+
+        key = chess.polyglot.zobrist_hash(board)
+        entry = self.tt.probe(key)
+        best_move = entry[4] if entry is not None else None
+        best_value = -math.inf
+        root_moves = []
+        completed_depth = 0
+        pv = []
+        stack_size = len(board.move_stack)
+        self.reset_eval(board)
+
+        try:
+            for depth in range(1, max_depth + 1):
+                self.root_best = None
+                best_move, best_value, root_moves = self.search_root(board, depth, best_move, multipv)
+                completed_depth = depth
+                if best_move is None:
+                    break
+                self.tt.store(key, depth, EXACT, best_value, best_move)
+                pv = self.get_pv(board, depth)
+                if abs(best_value) >= MATE_THRESHOLD:
+                    break
+        except SearchTimeout:
+            while len(board.move_stack) > stack_size:
+                board.pop()
+            # The previous best move is searched first, so a partial iteration's best is at least as good
+            if self.root_best is not None:
+                best_move, best_value = self.root_best
+            if best_move is None:
+                best_move = next(iter(board.legal_moves), None)
+        finally:
+            self.deadline = None
+            self.stop_event = None
 
         elapsed = time.time() - start_time
-        print(f"  nodes={self.nodes_visited}  time={elapsed:.3f}s  max_qdepth={self.max_quiescence_depth}")
+        if self.verbose:
+            print(f"  nodes={self.nodes_visited}  time={elapsed:.3f}s  max_qdepth={self.max_quiescence_depth}"
+                  f"  tt_hits={self.tt.hits}/{self.tt.probes} ({self.tt.hit_rate() * 100:.1f}%)"
+                  f"  first_cut={self.first_move_cutoff_rate() * 100:.1f}% avg_cut_idx={self.average_cutoff_index():.2f}"
+                  f"  depth={completed_depth}  pv={' '.join(m.uci() for m in pv)}")
+        return best_move, root_moves
+
+    def get_best_move(self, board, time_limit=None, max_depth=None):
+        """Play a book move if there is one, else find the best move with iterative deepening (see analyze)"""
+        if self.book is not None:
+            book_move = self.book.choose_move(board)
+            if book_move is not None:
+                if self.verbose:
+                    print(f"  book move {book_move.uci()}")
+                return book_move
+        best_move, _ = self.analyze(board, top_k=1, time_limit=time_limit, max_depth=max_depth)
         return best_move
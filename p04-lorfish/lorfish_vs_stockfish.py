@@ -1,7 +1,10 @@
 import chess
 import chess.engine
+import multiprocessing.util
+import random
 import sys
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Configuration Constants
 STOCKFISH_PATH = r"C:\Users\lorand\Programs\stockfish\stockfish-windows-x86-64-avx2.exe"
@@ -11,32 +14,42 @@ DEFAULT_STOCKFISH_ELO = 1800
 DEFAULT_NUM_GAMES = 100
 STOCKFISH_TIME_LIMIT = 0.5  # seconds per move
 STOCKFISH_THREADS = 4
+STOCKFISH_HASH_MB = 512
+LORFISH_TT_MB = 64  # transposition table memory budget
+# Opening book: each colour-swapped pair starts from one book line (both sides' moves), drawn
+# with the pair number as seed, so the pentanomial SPRT compares the two games like for like
+LORFISH_BOOK_PATH = None  # Polyglot .bin (e.g. "lorfish_book.bin" from opening_book.py); None starts from move 1
+LORFISH_BOOK_MAX_PLY = 12  # plies of the book line
+LORFISH_TIME_LIMIT = None  # seconds per move; None searches to the fixed depth, STOCKFISH_TIME_LIMIT gives equal time
+DEFAULT_NUM_WORKERS = os.cpu_count() or 1  # games played at once; 1 plays them one after another
+WORKER_STOCKFISH_THREADS = 1  # Stockfish threads per worker when games run in parallel
+WORKER_STOCKFISH_HASH_MB = 16  # hash per worker's Stockfish; one engine runs per CPU, so keep it small
+
+# SPRT early stopping: play up to num_games but stop once LorFish is shown to be
+# SPRT_ELO0 or SPRT_ELO1 Elo stronger than this Stockfish setting
+USE_SPRT = False
+SPRT_ELO0 = 0
+SPRT_ELO1 = 50
+SPRT_ALPHA = 0.05
+SPRT_BETA = 0.05
 
 # Add parent directory to path to import lorfish
 sys.path.insert(0, os.path.dirname(__file__))
 from lorfish import LorFish
+from opening_book import OpeningBook
+from sprt import SPRT
 
 
-def play_game(lorfish_engine, stockfish_engine, lorfish_plays_white=True):
-    """Play a single game between LorFish and Stockfish"""
+def play_game(lorfish_engine, stockfish_engine, lorfish_plays_white=True, lorfish_time_limit=LORFISH_TIME_LIMIT,
+              opening=()):
+    """Play a single game between LorFish and Stockfish, starting after the opening moves"""
     board = chess.Board()
+    for move in opening:
+        board.push(move)
     
     while not board.is_game_over(claim_draw=True):
-        # White's turn
-        if lorfish_plays_white:
-            move = lorfish_engine.get_best_move(board)
-        else:
-            result = stockfish_engine.play(board, chess.engine.Limit(time=STOCKFISH_TIME_LIMIT))
-            move = result.move
-        
-        board.push(move)
-        
-        if board.is_game_over(claim_draw=True):
-            break
-        
-        # Black's turn
-        if not lorfish_plays_white:
-            move = lorfish_engine.get_best_move(board)
+        if (board.turn == chess.WHITE) == lorfish_plays_white:
+            move = lorfish_engine.get_best_move(board, time_limit=lorfish_time_limit)
         else:
             result = stockfish_engine.play(board, chess.engine.Limit(time=STOCKFISH_TIME_LIMIT))
             move = result.move
@@ -46,59 +59,156 @@ def play_game(lorfish_engine, stockfish_engine, lorfish_plays_white=True):
     return board.result()
 
 
-def play_match(lorfish_depth=DEFAULT_LORFISH_DEPTH, stockfish_elo=DEFAULT_STOCKFISH_ELO, num_games=DEFAULT_NUM_GAMES):
-    """Play a match of multiple games between LorFish and Stockfish"""
-    
-    print(f"LorFish (depth {lorfish_depth}) vs Stockfish (Elo {stockfish_elo}) - {num_games} games\n")
-    
-    lorfish_engine = LorFish(depth=lorfish_depth)
-    
-    # Initialize Stockfish
+def open_book():
+    """The match opening book, or None; each process opens its own"""
+    if LORFISH_BOOK_PATH is None:
+        return None
+    return OpeningBook(LORFISH_BOOK_PATH, max_ply=LORFISH_BOOK_MAX_PLY)
+
+
+def pair_opening(book, game_num):
+    """Book line shared by both games of game_num's colour-swapped pair (games 2k-1 and 2k)"""
+    if book is None:
+        return []
+    return book.opening_line(random.Random((game_num - 1) // 2))
+
+
+def start_stockfish(stockfish_elo, threads, hash_mb):
+    """Launch and configure a Stockfish process at the given strength"""
     stockfish = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
-    
     stockfish.configure({
         "UCI_LimitStrength": True,
         "UCI_Elo": stockfish_elo,
-        "Threads": STOCKFISH_THREADS,
-        "Hash": 512
+        "Threads": threads,
+        "Hash": hash_mb
     })
+    return stockfish
+
+
+def lorfish_plays_white_in(game_num):
+    """LorFish takes White in odd-numbered games, so colours alternate regardless of worker count"""
+    return game_num % 2 == 1
+
+
+def record_result(stats, result, lorfish_plays_white):
+    """Add a game result to the LorFish W/D/L tally and return LorFish's score for the game"""
+    if result == "1-0":
+        score = 1 if lorfish_plays_white else 0
+    elif result == "0-1":
+        score = 0 if lorfish_plays_white else 1
+    else:
+        score = 0.5
+    stats[{1: "wins", 0.5: "draws", 0: "losses"}[score]] += 1
+    return score
+
+
+# Per-process engines for parallel matches, created once by init_worker
+worker_lorfish = None
+worker_stockfish = None
+worker_book = None
+
+
+def init_worker(lorfish_depth, stockfish_elo):
+    global worker_lorfish, worker_stockfish, worker_book
+    worker_lorfish = LorFish(depth=lorfish_depth, tt_size_mb=LORFISH_TT_MB, verbose=False)
+    worker_book = open_book()
+    worker_stockfish = start_stockfish(stockfish_elo, WORKER_STOCKFISH_THREADS, WORKER_STOCKFISH_HASH_MB)
+    # Pool workers exit without running atexit handlers, so register the cleanup with multiprocessing
+    multiprocessing.util.Finalize(worker_stockfish, worker_stockfish.quit, exitpriority=10)
+
+
+def play_worker_game(game_num, lorfish_time_limit):
+    lorfish_plays_white = lorfish_plays_white_in(game_num)
+    result = play_game(worker_lorfish, worker_stockfish, lorfish_plays_white, lorfish_time_limit,
+                       pair_opening(worker_book, game_num))
+    return game_num, result, lorfish_plays_white
+
+
+def play_match(lorfish_depth=DEFAULT_LORFISH_DEPTH, stockfish_elo=DEFAULT_STOCKFISH_ELO, num_games=DEFAULT_NUM_GAMES,
+               lorfish_time_limit=LORFISH_TIME_LIMIT, num_workers=DEFAULT_NUM_WORKERS, sprt=None):
+    """Play a match of multiple games between LorFish and Stockfish.
+
+    With num_workers > 1 the games are spread over a process pool; every worker owns
+    its own LorFish and a single-threaded Stockfish with a small hash. That Stockfish does
+    not play like the sequential 4-thread one at the same Elo setting, so parallel results
+    are not comparable with sequential runs (the Elo table in lorfish.py used 4 threads).
+    With an SPRT, the match stops as soon as the test accepts one of its hypotheses.
+    Games 2k-1 and 2k form a colour-swapped pair for pentanomial scoring.
+    """
+    
+    if lorfish_time_limit is None:
+        print(f"LorFish (depth {lorfish_depth}) vs Stockfish (Elo {stockfish_elo}) - {num_games} games\n")
+    else:
+        print(f"LorFish ({lorfish_time_limit}s/move) vs Stockfish (Elo {stockfish_elo}) - {num_games} games\n")
     
     # Track results
-    lorfish_wins = 0
-    stockfish_wins = 0
-    draws = 0
+    stats = {"wins": 0, "draws": 0, "losses": 0}
+    games_played = 0
     
-    # Play games
-    for game_num in range(1, num_games + 1):
-        lorfish_plays_white = (game_num % 2 == 1)
-        result = play_game(lorfish_engine, stockfish, lorfish_plays_white)
+    def report(game_num, result):
+        score = stats["wins"] + stats["draws"] * 0.5
+        sprt_text = f"  {sprt.summary()}" if sprt is not None else ""
+        print(f"Game {game_num}: {result}  |  LorFish: {stats['wins']}W {stats['draws']}D {stats['losses']}L  "
+              f"Score: {score}/{games_played}{sprt_text}")
+    
+    if num_workers <= 1:
+        lorfish_engine = LorFish(depth=lorfish_depth, tt_size_mb=LORFISH_TT_MB)
+        book = open_book()
+        stockfish = start_stockfish(stockfish_elo, STOCKFISH_THREADS, STOCKFISH_HASH_MB)
         
-        # Update statistics
-        if result == "1-0":
-            if lorfish_plays_white:
-                lorfish_wins += 1
-            else:
-                stockfish_wins += 1
-        elif result == "0-1":
-            if lorfish_plays_white:
-                stockfish_wins += 1
-            else:
-                lorfish_wins += 1
-        else:
-            draws += 1
+        for game_num in range(1, num_games + 1):
+            lorfish_plays_white = lorfish_plays_white_in(game_num)
+            result = play_game(lorfish_engine, stockfish, lorfish_plays_white, lorfish_time_limit,
+                               pair_opening(book, game_num))
+            score = record_result(stats, result, lorfish_plays_white)
+            games_played += 1
+            if sprt is not None:
+                sprt.add_game(score, pair_index=(game_num - 1) // 2)
+            report(game_num, result)
+            if sprt is not None and sprt.status() is not None:
+                break
         
-        score = lorfish_wins + draws * 0.5
-        print(f"Game {game_num}: {result}  |  LorFish: {lorfish_wins}W {draws}D {stockfish_wins}L  Score: {score}/{game_num}")
-    
-    stockfish.quit()
+        stockfish.quit()
+    else:
+        print(f"Running on {num_workers} workers\n")
+        with ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker,
+                                 initargs=(lorfish_depth, stockfish_elo)) as pool:
+            futures = [pool.submit(play_worker_game, game_num, lorfish_time_limit)
+                       for game_num in range(1, num_games + 1)]
+            for future in as_completed(futures):
+                game_num, result, lorfish_plays_white = future.result()
+                score = record_result(stats, result, lorfish_plays_white)
+                games_played += 1
+                if sprt is not None:
+                    sprt.add_game(score, pair_index=(game_num - 1) // 2)
+                report(game_num, result)
+                if sprt is not None and sprt.status() is not None:
+                    # Drop queued games; the ones already running are finished but not counted
+                    for pending in futures:
+                        pending.cancel()
+                    break
     
     # Print summary
-    print(f"\nLorFish: {lorfish_wins}W {draws}D {stockfish_wins}L (Score: {score}/{num_games})")
+    score = stats["wins"] + stats["draws"] * 0.5
+    print(f"\nLorFish: {stats['wins']}W {stats['draws']}D {stats['losses']}L (Score: {score}/{games_played})")
+    if sprt is not None:
+        status = sprt.status()
+        if status == "H1":
+            verdict = f"H1 accepted: LorFish is about {sprt.elo1:+} Elo or more"
+        elif status == "H0":
+            verdict = f"H0 accepted: LorFish is about {sprt.elo0:+} Elo or less"
+        else:
+            verdict = "inconclusive"
+        print(f"SPRT({sprt.elo0}, {sprt.elo1}) {sprt.summary()}  {verdict}")
+    return stats
 
 
 if __name__ == "__main__":
     play_match(
         lorfish_depth=DEFAULT_LORFISH_DEPTH,
         stockfish_elo=DEFAULT_STOCKFISH_ELO,
-        num_games=DEFAULT_NUM_GAMES
+        num_games=DEFAULT_NUM_GAMES,
+        lorfish_time_limit=LORFISH_TIME_LIMIT,
+        num_workers=DEFAULT_NUM_WORKERS,
+        sprt=SPRT(SPRT_ELO0, SPRT_ELO1, SPRT_ALPHA, SPRT_BETA) if USE_SPRT else None
     )
@@ -0,0 +1,104 @@
+import argparse
+import chess
+import chess.pgn
+import chess.polyglot
+import os
+import random
+import struct
+
+# Opening book for LorFish. Any Polyglot .bin book works (read with chess.polyglot); a book can
+# also be compiled from the local PGN archive into the same format, weighting each move by the
+# number of games that played it. While the position is in the book and within max_ply plies of
+# the start, LorFish plays a weighted random book move instead of searching.
+#
+#   python p04-lorfish/opening_book.py                 compile pgn_files/ into lorfish_book.bin
+
+BOOK_FILE = "lorfish_book.bin"
+PGN_DIR = "pgn_files"
+BOOK_MAX_PLY = 12  # plies from the start of the game during which the book is used
+COMPILE_MAX_PLY = 16  # plies of each archive game entered into a compiled book
+COMPILE_MIN_GAMES = 2  # leave out moves played in fewer games
+
+ENTRY_STRUCT = struct.Struct(">QHHI")  # Polyglot entry: key, move, weight, learn (big-endian)
+
+
+class OpeningBook:
+    def __init__(self, path=BOOK_FILE, max_ply=BOOK_MAX_PLY, rng=None):
+        self.reader = chess.polyglot.open_reader(path)
+        self.max_ply = max_ply
+        self.random = rng if rng is not None else random.Random()
+
+    def choose_move(self, board):
+        """Weighted random book move for board, or None when out of book or past max_ply"""
+        if board.ply() >= self.max_ply:
+            return None
+        try:
+            return self.reader.weighted_choice(board, random=self.random).move
+        except IndexError:
+            return None
+
+    def opening_line(self, rng=None, board=None):
+        """Book moves for both sides from board (default: the start), chosen until out of book or max_ply"""
+        board = chess.Board() if board is None else board.copy()
+        rng = rng if rng is not None else self.random
+        line = []
+        while board.ply() < self.max_ply:
+            try:
+                move = self.reader.weighted_choice(board, random=rng).move
+            except IndexError:
+                break
+            line.append(move)
+            board.push(move)
+        return line
+
+    def close(self):
+        self.reader.close()
+
+
+def polyglot_move(board, move):
+    """Polyglot encoding of move: castling is written as the king taking its own rook"""
+    to_square = move.to_square
+    if board.is_castling(move):
+        to_square = chess.square(7 if chess.square_file(move.to_square) == 6 else 0, chess.square_rank(to_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | move.from_square << 6 | promotion << 12
+
+
+def compile_book(pgn_dir=PGN_DIR, path=BOOK_FILE, max_ply=COMPILE_MAX_PLY, min_games=COMPILE_MIN_GAMES):
+    """Write a Polyglot book of the first max_ply plies of every game in pgn_dir; returns the entry count"""
+    counts = {}  # (key, polyglot move) -> games
+    for filename in sorted(os.listdir(pgn_dir)):
+        if not filename.endswith(".pgn"):
+            continue
+        with open(os.path.join(pgn_dir, filename), "r", encoding="utf-8") as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                board = game.board()
+                for move in list(game.mainline_moves())[:max_ply]:
+                    entry_key = (chess.polyglot.zobrist_hash(board), polyglot_move(board, move))
+                    counts[entry_key] = counts.get(entry_key, 0) + 1
+                    board.push(move)
+
+    entries = sorted((key, move, min(games, 0xFFFF)) for (key, move), games in counts.items() if games >= min_games)
+    with open(path, "wb") as f:
+        for key, move, weight in entries:
+            f.write(ENTRY_STRUCT.pack(key, move, weight, 0))
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a Polyglot opening book from a PGN directory")
+    parser.add_argument("--pgn-dir", default=PGN_DIR)
+    parser.add_argument("-o", "--output", default=BOOK_FILE)
+    parser.add_argument("--max-ply", type=int, default=COMPILE_MAX_PLY)
+    parser.add_argument("--min-games", type=int, default=COMPILE_MIN_GAMES)
+    args = parser.parse_args()
+
+    num_entries = compile_book(args.pgn_dir, args.output, args.max_ply, args.min_games)
+    print(f"Wrote {num_entries} book entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import math
+
+# Sequential probability ratio test for engine matches, using the normal approximation
+# of the generalized SPRT (as in fishtest). H0: elo = elo0, H1: elo = elo1 (logistic Elo).
+#
+# Games played in colour-swapped pairs are scored pentanomially (per-pair score in
+# 0, 0.25, 0.5, 0.75, 1), which accounts for the correlation between the two games of a pair.
+
+
+def elo_to_score(elo):
+    """Expected score for a given Elo difference"""
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class SPRT:
+    # One pseudo-win and one pseudo-loss are mixed into the mean and variance, so a short
+    # streak of identical results cannot decide the test on its own
+    PRIOR_SAMPLES = (0, 1)
+
+    def __init__(self, elo0=0, elo1=10, alpha=0.05, beta=0.05, pentanomial=True):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.alpha = alpha
+        self.beta = beta
+        self.pentanomial = pentanomial
+        self.lower_bound = math.log(beta / (1 - alpha))
+        self.upper_bound = math.log((1 - beta) / alpha)
+        self.s0 = elo_to_score(elo0)
+        self.s1 = elo_to_score(elo1)
+        self.samples = []  # game scores (trinomial) or pair scores (pentanomial)
+        self.pending = {}  # pair index -> score of the first finished game of the pair
+
+    def add_game(self, score, pair_index=None):
+        """Add a game score (1, 0.5 or 0). In pentanomial mode, pair_index groups the two colour-swapped games."""
+        if not self.pentanomial:
+            self.samples.append(score)
+        elif pair_index in self.pending:
+            self.samples.append((self.pending.pop(pair_index) + score) / 2)
+        else:
+            self.pending[pair_index] = score
+
+    def llr(self):
+        n = len(self.samples)
+        if n == 0:
+            return 0.0
+        samples = self.samples + list(self.PRIOR_SAMPLES)
+        mean = sum(samples) / len(samples)
+        variance = sum((x - mean) ** 2 for x in samples) / len(samples)
+        return n * (self.s1 - self.s0) * (2 * mean - self.s0 - self.s1) / (2 * variance)
+
+    def status(self):
+        """'H1' if elo1 is accepted, 'H0' if elo0 is accepted, None while undecided"""
+        llr = self.llr()
+        if llr >= self.upper_bound:
+            return "H1"
+        if llr <= self.lower_bound:
+            return "H0"
+        return None
+
+    def summary(self):
+        return f"LLR={self.llr():.2f} [{self.lower_bound:.2f}, {self.upper_bound:.2f}]"
@@ -1,16 +1,21 @@
 import chess
 import chess.pgn
-import math
 import os
 import pygame
 import pygame.freetype
+import queue
 import sys
+import threading
 from lorfish import LorFish
 
 # Initialize pygame
 pygame.init()
 pygame.freetype.init()
 
+# The engine searches on a worker thread; a short GIL switch interval lets the
+# drawing thread keep up its frame rate while the search runs
+sys.setswitchinterval(0.001)
+
 # Constants
 ENGINE_DEPTH = 2
 #
@@ -69,6 +74,12 @@ class ChessGUI:
         self.promotion_pending = None  # (from_square, to_square) when waiting for promotion choice
         self.engine_should_move = False  # Flag to trigger engine move on next frame
 
+        # Background search: the worker thread puts (cancel_event, engine_move) on the queue,
+        # and the main loop polls it every frame
+        self.search_thread = None
+        self.search_cancel = None
+        self.search_results = queue.Queue()
+
     def load_piece_images(self):
         images = {}
         for color in [chess.WHITE, chess.BLACK]:
@@ -404,30 +415,35 @@ class ChessGUI:
                     self.legal_moves = []
 
     def make_engine_move(self):
-        """Make a move for the engine"""
+        """Start the engine search on a worker thread; poll_engine_move applies the result"""
         if self.game_over or self.board.turn != chess.BLACK:
             return
 
         self.thinking = True
-        pygame.display.flip()
-
-        # Log all legal moves for Black with eval scores (Black's POV), ordered best first
-        self.engine.nodes_visited = 0
-        self.engine.max_quiescence_depth = 0
-        scored_moves = []
-        for move in self.board.legal_moves:
-            san = self.board.san(move)
-            self.board.push(move)
-            score = -self.engine.negamax(self.board, self.engine.depth - 1, -math.inf, math.inf)
-            self.board.pop()
-            scored_moves.append((san, score))
-        scored_moves.sort(key=lambda x: x[1], reverse=True)
-        print(f"\nMove {self.board.fullmove_number}... Black legal moves (sorted by eval):")
-        for san, score in scored_moves:
-            print(f"  {san:8s} {int(score):+d}")
-
-        # Get engine move
-        engine_move = self.engine.get_best_move(self.board)
+        self.search_cancel = threading.Event()
+        self.search_thread = threading.Thread(
+            target=self.search_worker, args=(self.board.copy(), self.search_cancel), daemon=True)
+        self.search_thread.start()
+
+    def search_worker(self, board, cancel):
+        """Runs on the worker thread with its own copy of the board"""
+        # One search gives the engine move and exact eval scores (Black's POV) for every legal move
+        engine_move, scored_moves = self.engine.analyze(board, top_k=None, stop_event=cancel)
+        if cancel.is_set():
+            return
+        print(f"\nMove {board.fullmove_number}... Black legal moves (sorted by eval):")
+        for move, score, _ in scored_moves:
+            print(f"  {board.san(move):8s} {int(score):+d}")
+        self.search_results.put((cancel, engine_move))
+
+    def poll_engine_move(self):
+        """Apply a finished engine search, ignoring results of cancelled searches"""
+        try:
+            cancel, engine_move = self.search_results.get_nowait()
+        except queue.Empty:
+            return
+        if cancel is not self.search_cancel or cancel.is_set():
+            return
 
         if engine_move:
             san = self.board.san(engine_move)
@@ -441,12 +457,23 @@ class ChessGUI:
                 self.game_over = True
 
         self.thinking = False
+        self.search_thread = None
+
+    def cancel_engine_move(self):
+        """Stop a search in progress and wait for the worker, which shares the engine instance"""
+        if self.search_thread is None:
+            return
+        self.search_cancel.set()
+        self.search_thread.join()
+        self.search_thread = None
+        self.thinking = False
 
     def undo_move(self):
         """Undo the last two moves (engine and human)"""
-        # Clear promotion dialog and pending engine move regardless
+        # Clear promotion dialog and pending or running engine move regardless
         self.promotion_pending = None
         self.engine_should_move = False
+        self.cancel_engine_move()
 
         if self.game_over:
             self.game_over = False
@@ -503,13 +530,17 @@ class ChessGUI:
 
             pygame.display.flip()
             
-            # Make engine move AFTER drawing white's move
+            # Start engine search AFTER drawing white's move, then pick up its result when ready
             if self.engine_should_move and not self.game_over and not self.thinking and not self.promotion_pending:
                 self.engine_should_move = False
                 self.make_engine_move()
+            if self.thinking:
+                self.poll_engine_move()
             
             self.clock.tick(FPS)
 
+        self.cancel_engine_move()
+
         # Save game to PGN
         game = chess.pgn.Game.from_board(self.board)
         game.headers["Event"] = "Human vs LorFish"
@@ -1,45 +1,20 @@
-import chess.pgn
+import chess
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+from pgn_index import indexed_player_games, open_index, update_index
 
 PLAYER = "lorand111"
 PGN_DIR = "pgn_files"
+INDEX_FILE = "pgn_index.sqlite"
 
-games = []
-
-for filename in sorted(os.listdir(PGN_DIR)):
-    if not filename.endswith(".pgn"):
-        continue
-    filepath = os.path.join(PGN_DIR, filename)
-    with open(filepath, "r", encoding="utf-8") as f:
-        while True:
-            game = chess.pgn.read_game(f)
-            if game is None:
-                break
-
-            white = game.headers.get("White", "")
-            black = game.headers.get("Black", "")
-
-            if PLAYER.lower() == white.lower():
-                player_color = chess.WHITE
-                color_name = "white"
-            elif PLAYER.lower() == black.lower():
-                player_color = chess.BLACK
-                color_name = "black"
-            else:
-                # Game doesn't involve the player, skip
-                continue
-
-            moves = list(game.mainline_moves())
-            games.append({
-                "game": game,
-                "color": player_color,
-                "color_name": color_name,
-                "moves": moves,
-            })
-
-print(f"Loaded {len(games)} games for {PLAYER}")
+index = open_index(INDEX_FILE)
+update_index(index, PGN_DIR)  # only new or changed files are re-scanned
 
-for i, g in enumerate(games):  
+num_games = 0
+for i, g in enumerate(indexed_player_games(index, PLAYER)):
+    num_games += 1
     game = g["game"]
     date = game.headers.get("Date", "?")
     result = game.headers.get("Result", "?")
@@ -60,3 +35,4 @@ for i, g in enumerate(games):
         san = board.san(move)
         board.push(move)
 
+print(f"\nAnalyzed {num_games} games for {PLAYER}")
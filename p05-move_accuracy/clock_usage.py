@@ -0,0 +1,177 @@
+import argparse
+import numpy as np
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+from pgn_scanner import iter_pgn_files
+
+# Clock usage of a player from the [%clk h:mm:ss.s] comments of the PGN archive. Each file is
+# read once and one regex pass (re.findall, in C) picks out the White / Black / TimeControl
+# headers and every clock stamp in file order; the game and ply of each stamp, the mover, and
+# the time spent are then worked out with NumPy on the whole file at once.
+#
+#   python p05-move_accuracy/clock_usage.py --player lorand111
+
+PGN_DIR = "pgn_files"
+PLAYER = "lorand111"
+
+TIME_TROUBLE_FRACTION = 0.1  # in time trouble with less than this share of the base time left
+PHASES = [("opening", 1, 10), ("middlegame", 11, 30), ("endgame", 31, None)]  # by move number
+
+TOKEN_PATTERN = re.compile(r'\[(White|Black|TimeControl) "([^"]*)"\]|\[%clk (\d+):(\d+):(\d+(?:\.\d+)?)\]')
+
+FIELDS = ["game", "move_number", "remaining", "delta", "spent", "base", "increment"]
+
+
+def empty_clock_data():
+    return {field: np.zeros(0, dtype=int if field in ("game", "move_number") else float) for field in FIELDS}
+
+
+def parse_time_control(time_control):
+    """(base, increment) in seconds for "600" or "180+2"; None for daily ("1/86400") or unknown"""
+    match = re.fullmatch(r"(\d+)(?:\+(\d+(?:\.\d+)?))?", time_control)
+    if match is None:
+        return None
+    return float(match.group(1)), float(match.group(2) or 0)
+
+
+def file_clock_data(filepath, player):
+    """Clock arrays for player's moves in one PGN file; game numbers count from 0 within the file"""
+    with open(filepath, "r", encoding="utf-8") as f:
+        tokens = TOKEN_PATTERN.findall(f.read())
+    if not tokens:
+        return empty_clock_data(), 0
+    tokens = np.array(tokens)
+    tags = tokens[:, 0]
+    game_of_token = np.cumsum(tags == "White") - 1  # [White "..."] opens every game
+    num_games = int(game_of_token[-1]) + 1
+
+    player = player.lower()
+    plays_white = np.zeros(num_games, dtype=bool)
+    plays_black = np.zeros(num_games, dtype=bool)
+    is_white, is_black = tags == "White", tags == "Black"
+    plays_white[game_of_token[is_white]] = np.char.lower(tokens[is_white, 1]) == player
+    plays_black[game_of_token[is_black]] = np.char.lower(tokens[is_black, 1]) == player
+
+    # Base and increment per game; the few distinct time controls are parsed once each
+    base = np.full(num_games, np.nan)
+    increment = np.full(num_games, np.nan)
+    is_tc = tags == "TimeControl"
+    controls, control_index = np.unique(tokens[is_tc, 1], return_inverse=True)
+    parsed = np.array([parse_time_control(tc) or (np.nan, np.nan) for tc in controls]).reshape(-1, 2)
+    base[game_of_token[is_tc]] = parsed[control_index, 0]
+    increment[game_of_token[is_tc]] = parsed[control_index, 1]
+
+    is_clock = tags == ""
+    game = game_of_token[is_clock]
+    clock = tokens[is_clock, 2:5].astype(float) @ np.array([3600.0, 60.0, 1.0])
+    first = np.searchsorted(game, game)  # index of the game's first stamp; game is non-decreasing
+    ply = np.arange(len(game)) - first
+    white_moved = ply % 2 == 0
+
+    # The mover's previous clock: two stamps back in the same game, or the base time on their first move
+    previous = np.empty_like(clock)
+    previous[2:] = clock[:-2]
+    own_first = ply < 2
+    previous[own_first] = base[game[own_first]]
+    delta = previous - clock
+    spent = delta + increment[game]  # the clock after a move already includes the increment
+
+    keep = np.where(white_moved, plays_white[game], plays_black[game]) & ~np.isnan(base[game])
+    data = {
+        "game": game[keep],
+        "move_number": ply[keep] // 2 + 1,
+        "remaining": clock[keep],
+        "delta": delta[keep],
+        "spent": spent[keep],
+        "base": base[game[keep]],
+        "increment": increment[game[keep]],
+    }
+    return data, num_games
+
+
+def extract_clock_data(pgn_dir=PGN_DIR, player=PLAYER):
+    """Clock arrays for every move player made in a timed game of pgn_dir.
+
+    Returns a dict of equal-length NumPy arrays (FIELDS): game number across the archive,
+    move number, clock left after the move, raw clock change, time spent (change plus the
+    increment) and the game's base time and increment, all in seconds.
+    """
+    parts = []
+    games_before = 0
+    for filepath in iter_pgn_files(pgn_dir):
+        data, num_games = file_clock_data(filepath, player)
+        data["game"] = data["game"] + games_before
+        games_before += num_games
+        parts.append(data)
+    if not parts:
+        return empty_clock_data()
+    return {field: np.concatenate([part[field] for part in parts]) for field in FIELDS}
+
+
+def time_trouble(data, fraction=TIME_TROUBLE_FRACTION):
+    """(share of moves, share of games) played with less than fraction of the base time left"""
+    in_trouble = data["remaining"] < fraction * data["base"]
+    games = np.unique(data["game"])
+    games_in_trouble = np.unique(data["game"][in_trouble])
+    move_share = in_trouble.mean() if len(in_trouble) else 0.0
+    game_share = len(games_in_trouble) / len(games) if len(games) else 0.0
+    return float(move_share), game_share
+
+
+def think_time_by_move(data):
+    """(move numbers, mean seconds spent, moves counted), for every move number that occurs"""
+    counts = np.bincount(data["move_number"])
+    totals = np.bincount(data["move_number"], weights=data["spent"])
+    numbers = np.nonzero(counts)[0]
+    return numbers, totals[numbers] / counts[numbers], counts[numbers]
+
+
+def think_time_by_phase(data, phases=PHASES):
+    """{phase: (mean seconds spent, mean share of the base time spent, moves)} by move-number phase"""
+    result = {}
+    for name, first, last in phases:
+        in_phase = data["move_number"] >= first
+        if last is not None:
+            in_phase &= data["move_number"] <= last
+        spent = data["spent"][in_phase]
+        if len(spent):
+            result[name] = (spent.mean(), (spent / data["base"][in_phase]).mean(), len(spent))
+        else:
+            result[name] = (0.0, 0.0, 0)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clock usage of a player from the [%%clk] comments")
+    parser.add_argument("--pgn-dir", default=PGN_DIR)
+    parser.add_argument("--player", default=PLAYER)
+    parser.add_argument("--max-move", type=int, default=40, help="last move number in the per-move table")
+    args = parser.parse_args()
+
+    data = extract_clock_data(args.pgn_dir, args.player)
+    num_games = len(np.unique(data["game"]))
+    print(f"{args.player}: {len(data['spent'])} timed moves in {num_games} games")
+    if not num_games:
+        return
+
+    move_share, game_share = time_trouble(data)
+    print(f"Average think time {data['spent'].mean():.1f}s (median {np.median(data['spent']):.1f}s)")
+    print(f"Time trouble (<{TIME_TROUBLE_FRACTION:.0%} of base time left): "
+          f"{move_share:.1%} of moves, {game_share:.1%} of games")
+
+    print("\nThink time by phase:")
+    for name, (mean_spent, mean_share, moves) in think_time_by_phase(data).items():
+        print(f"  {name:10s} {mean_spent:6.1f}s  {mean_share:6.2%} of base  ({moves} moves)")
+
+    print("\nThink time by move number:")
+    for number, mean_spent, moves in zip(*think_time_by_move(data)):
+        if number > args.max_move:
+            break
+        print(f"  {number:3d}  {mean_spent:6.1f}s  ({moves} moves)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,150 @@
-import requests
+import json
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Incremental download of the player's monthly archives from the chess.com API.
+# Files are named by archive month (pgn_files/games_2026_02.pgn). A past month that was
+# downloaded after it ended is complete and never fetched again; the current month (and a
+# past month last fetched while it was still running) is re-requested with If-None-Match /
+# If-Modified-Since, so an unchanged archive costs a 304 and no body.
 
 PLAYER = "lorand111"
+API_BASE = "https://api.chess.com/pub"  # point at a local server to test
+PGN_DIR = "pgn_files"
+STATE_FILE = "download_state.json"  # per-month ETag / Last-Modified, kept in PGN_DIR
 
-archives_url = "https://api.chess.com/pub/player/"+PLAYER+"/games/archives"
+NUM_DOWNLOAD_THREADS = 4  # months fetched at once over one pooled session
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1.0  # waits 1, 2, 4, ... seconds between retries (Retry-After is honoured)
+REQUEST_TIMEOUT = 30
 
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:134.0) Gecko/20100101 Firefox/134.0"
 }
 
-archives_response = requests.get(archives_url, headers=headers)
-archives_response.raise_for_status()
-urls = [url + "/pgn" for url in archives_response.json()["archives"]]
-print(urls)
-
-# Create directory if it doesn't exist
-os.makedirs("pgn_files", exist_ok=True)
-
-# Download the files
-for i, url in enumerate(urls):
-    response = requests.get(url, headers=headers)
-    if response.status_code == 200:
-        filename = f"pgn_files/games_{i}.pgn"
-        with open(filename, 'w') as f:
-            f.write(response.text)
-        print(f"Downloaded: {filename}")
-    else:
+
+def make_session(num_threads=NUM_DOWNLOAD_THREADS):
+    """Session with connection pooling and retry with exponential backoff on 429 and 5xx"""
+    retry = Retry(total=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET"], respect_retry_after_header=True)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=num_threads)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers)
+    return session
+
+
+def archive_month(url):
+    """'2026_02' for an archive URL ending in /2026/02"""
+    match = re.search(r"/(\d{4})/(\d{2})/?$", url)
+    if match is None:
+        raise ValueError(f"Not a monthly archive URL: {url}")
+    return f"{match.group(1)}_{match.group(2)}"
+
+
+def current_month():
+    return datetime.now(timezone.utc).strftime("%Y_%m")
+
+
+def load_state(pgn_dir):
+    try:
+        with open(os.path.join(pgn_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(pgn_dir, state):
+    path = os.path.join(pgn_dir, STATE_FILE)
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, path)
+
+
+def fetch_archive_urls(session, player=PLAYER, api_base=API_BASE):
+    response = session.get(f"{api_base}/player/{player}/games/archives", timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["archives"]
+
+
+def download_month(session, url, filepath, month_state):
+    """Fetch one archive, conditionally if it was downloaded before.
+
+    Returns (downloaded, new month state); the file is replaced atomically, so readers
+    such as the PGN index never see a partial file.
+    """
+    conditional = {}
+    if os.path.exists(filepath):
+        if month_state.get("etag"):
+            conditional["If-None-Match"] = month_state["etag"]
+        if month_state.get("last_modified"):
+            conditional["If-Modified-Since"] = month_state["last_modified"]
+
+    response = session.get(url + "/pgn", headers=conditional, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        return False, month_state
+    if response.status_code != 200:
         print(f"Failed to download: {url}")
         print(f"  Status code: {response.status_code}")
         print(f"  Response headers: {dict(response.headers)}")
         body_preview = response.text[:500] if response.text else "<empty>"
         print(f"  Response body (first 500 chars): {body_preview}")
+        response.raise_for_status()
+
+    tmp_file = filepath + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(response.content)
+    os.replace(tmp_file, filepath)
+    return True, {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+
+def download_archives(player=PLAYER, pgn_dir=PGN_DIR, api_base=API_BASE, num_threads=NUM_DOWNLOAD_THREADS):
+    """Bring pgn_dir up to date with the player's archives; returns the paths that changed"""
+    os.makedirs(pgn_dir, exist_ok=True)
+    state = load_state(pgn_dir)
+    this_month = current_month()
+    changed = []
+
+    with make_session(num_threads) as session:
+        urls = fetch_archive_urls(session, player, api_base)
+        jobs = []
+        for url in urls:
+            month = archive_month(url)
+            filepath = os.path.join(pgn_dir, f"games_{month}.pgn")
+            if state.get(month, {}).get("complete") and os.path.exists(filepath):
+                continue
+            jobs.append((url, month, filepath))
+        print(f"{len(urls)} monthly archives, {len(urls) - len(jobs)} complete, {len(jobs)} to check")
+
+        with ThreadPoolExecutor(max_workers=num_threads) as pool:
+            futures = {pool.submit(download_month, session, url, filepath, state.get(month, {})): (month, filepath)
+                       for url, month, filepath in jobs}
+            for future in as_completed(futures):
+                month, filepath = futures[future]
+                try:
+                    downloaded, month_state = future.result()
+                except requests.RequestException as e:
+                    print(f"Giving up on {month}: {e}")
+                    continue
+                # Fetched after the month ended, the archive can no longer change
+                state[month] = {**month_state, "complete": month < this_month}
+                save_state(pgn_dir, state)
+                if downloaded:
+                    changed.append(filepath)
+                    print(f"Downloaded: {filepath}")
+                else:
+                    print(f"Unchanged: {filepath}")
+
+    return sorted(changed)
+
+
+if __name__ == "__main__":
+    download_archives()
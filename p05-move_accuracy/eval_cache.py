@@ -0,0 +1,86 @@
+import sqlite3
+import time
+
+# Persistent evaluation cache shared by analysis runs and worker processes. Entries are keyed
+# on the normalised FEN (board.epd(): pieces, side to move, castling and a legal en-passant
+# square, no move clocks) plus an engine settings string (engine name and search limit), so
+# results from a different engine or depth are never mixed. Least recently used entries are
+# evicted once the cache holds more than max_entries positions.
+
+EVAL_CACHE_FILE = "eval_cache.sqlite"
+MAX_ENTRIES = 2_000_000
+EVICT_CHECK_INTERVAL = 50  # flushes between size checks; COUNT(*) scans the table
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS evals (
+    fen TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    cp INTEGER NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (fen, settings)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS evals_last_used ON evals (last_used);
+"""
+
+
+class EvalCache:
+    def __init__(self, settings, path=EVAL_CACHE_FILE, max_entries=MAX_ENTRIES):
+        self.settings = settings
+        self.max_entries = max_entries
+        # Several worker processes share the file: WAL lets readers run alongside the one writer
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.new_entries = {}  # fen -> cp, written at the next flush
+        self.used = set()  # fens read from the cache since the last flush, for the LRU timestamp
+        self.flushes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, board):
+        """Cached White-relative eval of board, or None"""
+        fen = board.epd()
+        cp = self.new_entries.get(fen)
+        if cp is None:
+            row = self.conn.execute("SELECT cp FROM evals WHERE fen = ? AND settings = ?",
+                                    (fen, self.settings)).fetchone()
+            if row is not None:
+                cp = row[0]
+                self.used.add(fen)
+        if cp is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return cp
+
+    def put(self, board, cp):
+        self.new_entries[board.epd()] = cp
+
+    def flush(self):
+        """Write new entries and LRU timestamps in one short transaction, then evict if over the limit"""
+        now = time.time_ns()
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO evals VALUES (?, ?, ?, ?)",
+                                  ((fen, self.settings, cp, now) for fen, cp in self.new_entries.items()))
+            self.conn.executemany("UPDATE evals SET last_used = ? WHERE fen = ? AND settings = ?",
+                                  ((now, fen, self.settings) for fen in self.used))
+        self.new_entries.clear()
+        self.used.clear()
+        self.flushes += 1
+        if self.flushes % EVICT_CHECK_INTERVAL == 0:
+            self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries beyond max_entries"""
+        with self.conn:
+            count = self.conn.execute("SELECT COUNT(*) FROM evals").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self.conn.execute("DELETE FROM evals WHERE (fen, settings) IN "
+                                  "(SELECT fen, settings FROM evals ORDER BY last_used LIMIT ?)", (excess,))
+
+    def close(self):
+        self.flush()
+        self.evict()
+        self.conn.close()
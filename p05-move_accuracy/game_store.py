@@ -0,0 +1,173 @@
+import argparse
+import array
+import chess
+import chess.pgn
+import json
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from pgn_scanner import iter_pgn_files, scan_headers
+
+# Compact binary copy of the PGN archive, so analysis passes replay games without parsing
+# SAN or clock comments. One file holds, little-endian:
+#
+#   header       magic, number of games, number of plies, length of the header table
+#   game_starts  uint32 per game + 1: index of each game's first ply in the arrays below
+#   clocks       uint32 per ply: clock after the move in tenths of a second, NO_CLOCK if absent
+#   moves        uint16 per ply: from | to << 6 | promotion piece type << 12
+#   header table UTF-8 JSON, one {"file", "offset", "headers"} entry per game
+#
+#   python p05-move_accuracy/game_store.py              convert pgn_files/ and time both loads
+
+PGN_DIR = "pgn_files"
+STORE_FILE = "game_store.bin"
+
+MAGIC = b"LGS1"
+FILE_HEADER = struct.Struct("<4sIII")
+CLOCK_SCALE = 10  # stored clock units per second
+NO_CLOCK = 0xFFFFFFFF
+
+
+def encode_move(move):
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code):
+    return chess.Move(code & 63, code >> 6 & 63, code >> 12 or None)
+
+
+def encode_clock(seconds):
+    return NO_CLOCK if seconds is None else round(seconds * CLOCK_SCALE)
+
+
+def little_endian(values):
+    """values as little-endian bytes, whatever the machine byte order"""
+    if sys.byteorder == "big":
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_store(pgn_dir=PGN_DIR, path=STORE_FILE):
+    """Convert every game in pgn_dir into a store at path; returns the number of games written"""
+    game_starts = array.array("I", [0])
+    clocks = array.array("I")
+    moves = array.array("H")
+    table = []
+    for filepath in iter_pgn_files(pgn_dir):
+        with open(filepath, "r", encoding="utf-8") as f:
+            offsets = [offset for offset, _, _ in scan_headers(filepath)]
+            for offset in offsets:
+                f.seek(offset)
+                game = chess.pgn.read_game(f)
+                if game.errors:
+                    print(f"Skipping {filepath}@{offset}: {game.errors[0]}")
+                    continue
+                for node in game.mainline():
+                    moves.append(encode_move(node.move))
+                    clocks.append(encode_clock(node.clock()))
+                game_starts.append(len(moves))
+                table.append({"file": filepath, "offset": offset, "headers": dict(game.headers)})
+
+    header_table = json.dumps(table, separators=(",", ":")).encode("utf-8")
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(FILE_HEADER.pack(MAGIC, len(table), len(moves), len(header_table)))
+        f.write(little_endian(game_starts))
+        f.write(little_endian(clocks))
+        f.write(little_endian(moves))
+        f.write(header_table)
+    os.replace(tmp_file, path)
+    return len(table)
+
+
+class GameStore:
+    """Games of a store file, loaded whole into flat arrays"""
+
+    def __init__(self, path=STORE_FILE):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, num_games, num_plies, table_length = FILE_HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a game store")
+        pos = FILE_HEADER.size
+        self.game_starts = self._read_array("I", data, pos, num_games + 1)
+        pos += 4 * (num_games + 1)
+        self.clock_array = self._read_array("I", data, pos, num_plies)
+        pos += 4 * num_plies
+        self.move_array = self._read_array("H", data, pos, num_plies)
+        pos += 2 * num_plies
+        self.table = json.loads(data[pos:pos + table_length].decode("utf-8"))
+
+    @staticmethod
+    def _read_array(typecode, data, pos, count):
+        values = array.array(typecode)
+        values.frombytes(data[pos:pos + count * values.itemsize])
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def __len__(self):
+        return len(self.table)
+
+    def headers(self, i):
+        return self.table[i]["headers"]
+
+    def source(self, i):
+        """(file, byte offset) of game i in the PGN archive, for read_game_at"""
+        return self.table[i]["file"], self.table[i]["offset"]
+
+    def move_codes(self, i):
+        return self.move_array[self.game_starts[i]:self.game_starts[i + 1]]
+
+    def moves(self, i):
+        return [decode_move(code) for code in self.move_codes(i)]
+
+    def clocks(self, i):
+        """Clock in seconds after each move of game i, None where the PGN had none"""
+        return [None if c == NO_CLOCK else c / CLOCK_SCALE
+                for c in self.clock_array[self.game_starts[i]:self.game_starts[i + 1]]]
+
+    def board(self, i):
+        """Starting position of game i (honours FEN and Variant headers like chess.pgn)"""
+        return chess.pgn.Headers(self.headers(i)).board()
+
+    def replay(self, i):
+        """Final position of game i, with the moves on its move stack"""
+        board = self.board(i)
+        for code in self.move_codes(i):
+            board.push(decode_move(code))
+        return board
+
+    def positions(self, i):
+        """Yield (board, move, clock) before each move of game i; the board is updated in place"""
+        board = self.board(i)
+        for move, clock in zip(self.moves(i), self.clocks(i)):
+            yield board, move, clock
+            board.push(move)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the PGN archive into a binary game store")
+    parser.add_argument("--pgn-dir", default=PGN_DIR)
+    parser.add_argument("--store", default=STORE_FILE)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    num_games = write_store(args.pgn_dir, args.store)
+    convert_time = time.perf_counter() - t0
+    print(f"Wrote {num_games} games to {args.store} ({os.path.getsize(args.store)} bytes) in {convert_time:.2f}s")
+
+    t0 = time.perf_counter()
+    store = GameStore(args.store)
+    for i in range(len(store)):
+        store.replay(i)
+    load_time = time.perf_counter() - t0
+    print(f"Reloaded and replayed {len(store)} games from the store in {load_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
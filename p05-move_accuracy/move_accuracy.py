@@ -0,0 +1,233 @@
+import chess
+import chess.engine
+import csv
+import math
+import multiprocessing.util
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from eval_cache import EVAL_CACHE_FILE, EvalCache
+from pgn_index import open_index, query_games, update_index
+from pgn_scanner import player_color, read_game_at
+
+STOCKFISH_PATH = r"C:\Users\lorand\Programs\stockfish\stockfish-windows-x86-64-avx2.exe"
+#STOCKFISH_PATH = "/usr/local/bin/stockfish"
+PLAYER = "lorand111"
+PGN_DIR = "pgn_files"
+INDEX_FILE = "pgn_index.sqlite"
+
+ANALYSIS_DEPTH = 12
+ANALYSIS_NODES = None  # set to a node count to analyse by nodes instead of depth
+NUM_WORKERS = os.cpu_count() or 1  # engine processes; each worker analyses whole games on its own engine
+ENGINE_THREADS = 1  # one thread per engine: separate games scale better than threads in one search
+ENGINE_HASH_MB = 16
+MAX_PENDING_PER_WORKER = 4  # games queued ahead per worker, so the archive is never all in memory
+USE_EVAL_CACHE = True  # look positions up in EVAL_CACHE_FILE before sending them to the engine
+
+EVAL_CAP = 1000  # centipawns; mate scores and larger evals are clipped to this for the loss
+MATE_SCORE = 100000  # how mates are stored in the eval cache, before clipping
+
+FIELDNAMES = ['file', 'offset', 'date', 'color', 'opponent', 'result', 'eco', 'num_moves',
+              'acpl', 'accuracy', 'blunders', 'mistakes', 'inaccuracies', 'positions', 'cache_hits']
+
+
+def analysis_limit():
+    if ANALYSIS_NODES is not None:
+        return chess.engine.Limit(nodes=ANALYSIS_NODES)
+    return chess.engine.Limit(depth=ANALYSIS_DEPTH)
+
+
+def analysis_settings(engine):
+    """Eval cache key part: evals from another engine or search limit are not reused"""
+    limit = f"nodes={ANALYSIS_NODES}" if ANALYSIS_NODES is not None else f"depth={ANALYSIS_DEPTH}"
+    return f"{engine.id.get('name', '?')}|{limit}"
+
+
+def win_percent(cp):
+    """Winning chances (0-100) for a centipawn eval, as used by Lichess"""
+    return 50 + 50 * (2 / (1 + math.exp(-0.00368208 * cp)) - 1)
+
+
+def move_accuracy(win_before, win_after):
+    """Accuracy (0-100) of a move from the mover's winning chances before and after it (Lichess formula)"""
+    accuracy = 103.1668 * math.exp(-0.04354 * max(0.0, win_before - win_after)) - 3.1669
+    return min(100.0, max(0.0, accuracy))
+
+
+def evaluate_position(engine, board, cache=None):
+    """Eval in centipawns from White's point of view, clipped to +-EVAL_CAP"""
+    if board.is_checkmate():
+        return -EVAL_CAP if board.turn == chess.WHITE else EVAL_CAP
+    if board.is_stalemate() or board.is_insufficient_material():
+        return 0
+    cp = cache.get(board) if cache is not None else None
+    if cp is None:
+        info = engine.analyse(board, analysis_limit())
+        cp = info["score"].white().score(mate_score=MATE_SCORE)
+        if cache is not None:
+            cache.put(board, cp)
+    return max(-EVAL_CAP, min(EVAL_CAP, cp))
+
+
+def analyze_game(engine, game, color, cache=None):
+    """Centipawn loss and accuracy of color's moves in game.
+
+    Every position of the game is evaluated once: a position is the "after" of one
+    move and the "before" of the next. With a cache, known positions skip the engine.
+    """
+    hits_before = cache.hits if cache is not None else 0
+    board = game.board()
+    evals = [evaluate_position(engine, board, cache)]
+    movers = []
+    for move in game.mainline_moves():
+        movers.append(board.turn)
+        board.push(move)
+        evals.append(evaluate_position(engine, board, cache))
+    if cache is not None:
+        cache.flush()
+
+    sign = 1 if color == chess.WHITE else -1
+    losses, accuracies = [], []
+    blunders = mistakes = inaccuracies = 0
+    for i, mover in enumerate(movers):
+        if mover != color:
+            continue
+        before, after = sign * evals[i], sign * evals[i + 1]
+        losses.append(max(0, before - after))
+        accuracies.append(move_accuracy(win_percent(before), win_percent(after)))
+        win_drop = win_percent(before) - win_percent(after)
+        if win_drop >= 30:
+            blunders += 1
+        elif win_drop >= 20:
+            mistakes += 1
+        elif win_drop >= 10:
+            inaccuracies += 1
+
+    return {
+        'num_moves': len(losses),
+        'acpl': round(sum(losses) / len(losses), 1) if losses else 0.0,
+        'accuracy': round(sum(accuracies) / len(accuracies), 1) if accuracies else 100.0,
+        'blunders': blunders,
+        'mistakes': mistakes,
+        'inaccuracies': inaccuracies,
+        'positions': len(evals),
+        'cache_hits': cache.hits - hits_before if cache is not None else 0,
+    }
+
+
+def open_engine(threads=ENGINE_THREADS, hash_mb=ENGINE_HASH_MB):
+    engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
+    engine.configure({"Threads": threads, "Hash": hash_mb})
+    return engine
+
+
+def open_cache(engine, use_cache=USE_EVAL_CACHE):
+    return EvalCache(analysis_settings(engine), EVAL_CACHE_FILE) if use_cache else None
+
+
+# Engine and eval cache owned by the current worker process, created once by init_worker
+worker_engine = None
+worker_cache = None
+
+
+def init_worker(use_cache=USE_EVAL_CACHE):
+    global worker_engine, worker_cache
+    worker_engine = open_engine()
+    worker_cache = open_cache(worker_engine, use_cache)
+    # Pool workers exit without running atexit handlers, so register the cleanup with multiprocessing
+    multiprocessing.util.Finalize(worker_engine, worker_engine.quit, exitpriority=10)
+    if worker_cache is not None:
+        multiprocessing.util.Finalize(worker_cache, worker_cache.close, exitpriority=10)
+
+
+def analyze_game_job(filepath, offset, player, engine=None, cache=None):
+    """Read the game at filepath/offset and score player's moves; returns a result row"""
+    game = read_game_at(filepath, offset)
+    color = player_color(game.headers, player)
+    if engine is None:
+        engine, cache = worker_engine, worker_cache
+    stats = analyze_game(engine, game, color, cache)
+    return {
+        'file': filepath,
+        'offset': offset,
+        'date': game.headers.get("Date", "?"),
+        'color': "white" if color == chess.WHITE else "black",
+        'opponent': game.headers.get("Black" if color == chess.WHITE else "White", "?"),
+        'result': game.headers.get("Result", "?"),
+        'eco': game.headers.get("ECO", "?"),
+        **stats,
+    }
+
+
+def run_move_accuracy(player=PLAYER, pgn_dir=PGN_DIR, index_file=INDEX_FILE, num_workers=NUM_WORKERS,
+                      output_file=None, use_cache=USE_EVAL_CACHE):
+    """Analyse every indexed game of player, writing one CSV row per game as soon as it is finished.
+
+    Games are spread over num_workers processes, each with its own single-threaded engine;
+    only this process writes the CSV.
+    """
+    index = open_index(index_file)
+    update_index(index, pgn_dir)
+    rows = query_games(index, player=player)
+    index.close()
+
+    if output_file is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = f"move_accuracy_{timestamp}.csv"
+
+    total = len(rows)
+    limit = f"{ANALYSIS_NODES} nodes" if ANALYSIS_NODES is not None else f"depth {ANALYSIS_DEPTH}"
+    print(f"Analysing {total} games of {player} at {limit} with {num_workers} engine(s)")
+    print(f"Results will be saved to: {output_file}")
+
+    with open(output_file, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        done = positions = cache_hits = 0
+
+        def record_game(result_row):
+            nonlocal done, positions, cache_hits
+            writer.writerow(result_row)
+            csvfile.flush()  # Ensure data is written immediately
+            done += 1
+            positions += result_row['positions']
+            cache_hits += result_row['cache_hits']
+            print(f"[{done}/{total}] {result_row['date']}  {result_row['color']:5s} vs {result_row['opponent']:20s} "
+                  f"ACPL {result_row['acpl']:6.1f}  accuracy {result_row['accuracy']:5.1f}%")
+
+        if num_workers <= 1:
+            engine = open_engine()
+            cache = open_cache(engine, use_cache)
+            try:
+                for row in rows:
+                    record_game(analyze_game_job(row["file"], row["offset"], player, engine, cache))
+            finally:
+                if cache is not None:
+                    cache.close()
+                engine.quit()
+        else:
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=init_worker,
+                                     initargs=(use_cache,)) as pool:
+                jobs = iter(rows)
+                pending = set()
+                while True:
+                    for row in jobs:
+                        pending.add(pool.submit(analyze_game_job, row["file"], row["offset"], player))
+                        if len(pending) >= num_workers * MAX_PENDING_PER_WORKER:
+                            break
+                    if not pending:
+                        break
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        record_game(future.result())
+
+    print(f"\nAnalysed {done} games, {positions} positions ({cache_hits} from the eval cache). "
+          f"Results saved to: {output_file}")
+    return output_file
+
+
+if __name__ == "__main__":
+    run_move_accuracy()
@@ -0,0 +1,142 @@
+import argparse
+import chess
+import chess.pgn
+import chess.polyglot
+import numpy as np
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from game_store import decode_move, encode_move
+from pgn_index import parse_elo
+from pgn_scanner import iter_pgn_files, player_color, scan_headers
+
+# Opening tree over the PGN archive. Positions are keyed by their Polyglot Zobrist hash, so
+# move orders that transpose into the same position share one node. For every (position, move)
+# the tree keeps the number of games, the points scored and the opponents' summed Elo. The
+# tree is built in one pass over the archive and saved as a NumPy array sorted by key, which
+# loads in milliseconds; a query is a binary search on the key column.
+#
+#   python p05-move_accuracy/opening_tree.py                       build the tree for lorand111
+#   python p05-move_accuracy/opening_tree.py --moves "e4 Nf6"      how did lorand111 do from here
+
+PGN_DIR = "pgn_files"
+TREE_FILE = "opening_tree.npy"
+PLAYER = "lorand111"  # None: every game, scored for the side to move
+MAX_PLY = 30  # plies of each game entered into the tree
+
+TREE_DTYPE = np.dtype([
+    ("key", "<u8"),        # chess.polyglot.zobrist_hash of the position
+    ("move", "<u2"),       # game_store.encode_move
+    ("games", "<u4"),
+    ("half_points", "<u4"),  # points scored x2, for the player (or for the side to move)
+    ("elo_sum", "<u8"),    # summed opponent Elo over the elo_games games that had one
+    ("elo_games", "<u4"),
+])
+
+RESULT_POINTS = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}  # half points for (White, Black)
+
+
+def build_tree(pgn_dir=PGN_DIR, player=PLAYER, max_ply=MAX_PLY):
+    """Streaming pass over pgn_dir; returns the tree as a TREE_DTYPE array sorted by key, then games"""
+    stats = {}  # (key, move code) -> [games, half points, Elo sum, games with an Elo]
+    for filepath in iter_pgn_files(pgn_dir):
+        with open(filepath, "r", encoding="utf-8") as f:  # one handle per file for the games read
+            for offset, _, headers in scan_headers(filepath):
+                points = RESULT_POINTS.get(headers.get("Result"))
+                if points is None:
+                    continue
+                color = None
+                if player is not None:
+                    color = player_color(headers, player)
+                    if color is None:
+                        continue
+                elos = (parse_elo(headers.get("WhiteElo")), parse_elo(headers.get("BlackElo")))
+                f.seek(offset)
+                game = chess.pgn.read_game(f)
+                board = game.board()
+                seen = set()  # a position repeated within one game is counted once
+                for ply, move in enumerate(game.mainline_moves()):
+                    if ply >= max_ply:
+                        break
+                    side = board.turn if color is None else color
+                    entry_key = (chess.polyglot.zobrist_hash(board), encode_move(move))
+                    if entry_key not in seen:
+                        seen.add(entry_key)
+                        entry = stats.setdefault(entry_key, [0, 0, 0, 0])
+                        opponent_elo = elos[side == chess.WHITE]  # WHITE is True: index 1 is Black's Elo
+                        entry[0] += 1
+                        entry[1] += points[0] if side == chess.WHITE else points[1]
+                        if opponent_elo is not None:
+                            entry[2] += opponent_elo
+                            entry[3] += 1
+                    board.push(move)
+
+    tree = np.array([(key, move, *entry) for (key, move), entry in stats.items()], dtype=TREE_DTYPE)
+    return tree[np.lexsort((-tree["games"].astype(np.int64), tree["key"]))]
+
+
+def save_tree(tree, path=TREE_FILE):
+    np.save(path, tree, allow_pickle=False)
+
+
+class OpeningTree:
+    def __init__(self, tree):
+        self.tree = tree
+        self.keys = tree["key"]
+
+    @classmethod
+    def load(cls, path=TREE_FILE):
+        return cls(np.load(path, allow_pickle=False))
+
+    def entries(self, board):
+        """Rows of the tree for board, most played move first"""
+        key = np.uint64(chess.polyglot.zobrist_hash(board))
+        return self.tree[np.searchsorted(self.keys, key, "left"):np.searchsorted(self.keys, key, "right")]
+
+    def moves(self, board):
+        """[{move, games, score, opponent_elo}] for board; score is the points share, 0-1"""
+        return [{
+            "move": decode_move(int(row["move"])),
+            "games": int(row["games"]),
+            "score": row["half_points"] / (2 * row["games"]),
+            "opponent_elo": row["elo_sum"] / row["elo_games"] if row["elo_games"] else None,
+        } for row in self.entries(board)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the opening tree of the PGN archive")
+    parser.add_argument("--pgn-dir", default=PGN_DIR)
+    parser.add_argument("--tree", default=TREE_FILE)
+    parser.add_argument("--player", default=PLAYER, help="'' for every game")
+    parser.add_argument("--max-ply", type=int, default=MAX_PLY)
+    parser.add_argument("--moves", help='SAN moves from the start position to query, e.g. "e4 Nf6"')
+    args = parser.parse_args()
+
+    if args.moves is None or not os.path.exists(args.tree):
+        t0 = time.perf_counter()
+        tree = build_tree(args.pgn_dir, args.player or None, args.max_ply)
+        save_tree(tree, args.tree)
+        print(f"Built {len(tree)} tree entries in {time.perf_counter() - t0:.2f}s, saved to {args.tree}")
+    if args.moves is None:
+        return
+
+    t0 = time.perf_counter()
+    tree = OpeningTree.load(args.tree)
+    print(f"Loaded {len(tree.tree)} entries in {(time.perf_counter() - t0) * 1000:.1f} ms")
+    board = chess.Board()
+    for san in args.moves.split():
+        board.push_san(san)
+    t0 = time.perf_counter()
+    moves = tree.moves(board)
+    print(f"After {args.moves} ({(time.perf_counter() - t0) * 1e6:.0f} us):")
+    for m in moves:
+        elo = f"{m['opponent_elo']:.0f}" if m["opponent_elo"] is not None else "?"
+        print(f"  {board.san(m['move']):7s} {m['games']:5d} games  score {m['score']:6.1%}  opponent Elo {elo}")
+    if not moves:
+        print("  no games")
+
+
+if __name__ == "__main__":
+    main()
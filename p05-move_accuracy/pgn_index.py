@@ -0,0 +1,169 @@
+import argparse
+import chess
+import chess.pgn
+import itertools
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+from pgn_scanner import iter_pgn_files, make_player_game, scan_headers
+
+# On-disk index over the PGN archive: one row per game with its file, byte offset and length
+# plus the key headers. A file is re-indexed only when its size or mtime changed, and queries
+# seek straight to the matching games instead of parsing the whole corpus.
+#
+#   python p05-move_accuracy/pgn_index.py                                 update the index
+#   python p05-move_accuracy/pgn_index.py --player lorand111 --color black --eco B07 --year 2026
+
+PGN_DIR = "pgn_files"
+INDEX_FILE = "pgn_index.sqlite"
+PLAYER = "lorand111"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS games (
+    file TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    white TEXT COLLATE NOCASE,
+    black TEXT COLLATE NOCASE,
+    result TEXT,
+    date TEXT,
+    eco TEXT,
+    time_control TEXT,
+    white_elo INTEGER,
+    black_elo INTEGER
+);
+CREATE INDEX IF NOT EXISTS games_white ON games (white);
+CREATE INDEX IF NOT EXISTS games_black ON games (black);
+CREATE INDEX IF NOT EXISTS games_file ON games (file, offset);
+"""
+
+
+def open_index(index_file=INDEX_FILE):
+    conn = sqlite3.connect(index_file)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parse_elo(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def index_pgn_file(conn, filepath):
+    """Replace the rows for filepath with a fresh header scan; returns the number of games"""
+    conn.execute("DELETE FROM games WHERE file = ?", (filepath,))
+    rows = (
+        (filepath, offset, length, headers.get("White"), headers.get("Black"), headers.get("Result"),
+         headers.get("Date"), headers.get("ECO"), headers.get("TimeControl"),
+         parse_elo(headers.get("WhiteElo")), parse_elo(headers.get("BlackElo")))
+        for offset, length, headers in scan_headers(filepath)
+    )
+    conn.executemany("INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return conn.execute("SELECT COUNT(*) FROM games WHERE file = ?", (filepath,)).fetchone()[0]
+
+
+def update_index(conn, pgn_dir=PGN_DIR):
+    """Re-index new or changed files and drop files that are gone; returns (files re-indexed, files unchanged)"""
+    known = {row["path"]: (row["size"], row["mtime_ns"]) for row in conn.execute("SELECT * FROM files")}
+    present = set()
+    reindexed = unchanged = 0
+    for filepath in iter_pgn_files(pgn_dir):
+        present.add(filepath)
+        st = os.stat(filepath)
+        if known.get(filepath) == (st.st_size, st.st_mtime_ns):
+            unchanged += 1
+            continue
+        with conn:  # one transaction per file, so an interrupted run leaves finished files indexed
+            num_games = index_pgn_file(conn, filepath)
+            conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (filepath, st.st_size, st.st_mtime_ns))
+        reindexed += 1
+        print(f"Indexed {filepath}: {num_games} games")
+
+    with conn:
+        for filepath in set(known) - present:
+            conn.execute("DELETE FROM games WHERE file = ?", (filepath,))
+            conn.execute("DELETE FROM files WHERE path = ?", (filepath,))
+    return reindexed, unchanged
+
+
+def query_games(conn, player=None, color=None, eco=None, year=None, result=None, time_control=None):
+    """Index rows matching all given filters, in archive order. color ('white'/'black') needs player."""
+    where, params = [], []
+    if player is not None:
+        if color == "white":
+            where.append("white = ?")
+            params.append(player)
+        elif color == "black":
+            where.append("black = ?")
+            params.append(player)
+        else:
+            where.append("(white = ? OR black = ?)")
+            params += [player, player]
+    if eco is not None:
+        where.append("eco = ?")
+        params.append(eco)
+    if year is not None:
+        where.append("date LIKE ?")
+        params.append(f"{year}.%")
+    if result is not None:
+        where.append("result = ?")
+        params.append(result)
+    if time_control is not None:
+        where.append("time_control = ?")
+        params.append(time_control)
+    sql = "SELECT * FROM games"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return conn.execute(sql + " ORDER BY file, offset", params).fetchall()
+
+
+def indexed_player_games(conn, player, **filters):
+    """Yield the same dicts as pgn_scanner.scan_player_games, reading only the matching games"""
+    rows = query_games(conn, player=player, **filters)
+    for filepath, file_rows in itertools.groupby(rows, key=lambda row: row["file"]):
+        with open(filepath, "r", encoding="utf-8") as f:  # rows come ordered by file, offset: one handle per file
+            for row in file_rows:
+                color = chess.WHITE if (row["white"] or "").lower() == player.lower() else chess.BLACK
+                f.seek(row["offset"])
+                yield make_player_game(chess.pgn.read_game(f), color)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index the PGN archive and query it by header")
+    parser.add_argument("--pgn-dir", default=PGN_DIR)
+    parser.add_argument("--index", default=INDEX_FILE)
+    parser.add_argument("--player", help=f"e.g. {PLAYER}")
+    parser.add_argument("--color", choices=["white", "black"])
+    parser.add_argument("--eco")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--result", choices=["1-0", "0-1", "1/2-1/2"])
+    parser.add_argument("--time-control")
+    args = parser.parse_args()
+
+    conn = open_index(args.index)
+    reindexed, unchanged = update_index(conn, args.pgn_dir)
+    total = conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+    print(f"Index: {total} games ({reindexed} files re-indexed, {unchanged} unchanged)")
+
+    if any(v is not None for v in (args.player, args.eco, args.year, args.result, args.time_control)):
+        rows = query_games(conn, player=args.player, color=args.color, eco=args.eco, year=args.year,
+                           result=args.result, time_control=args.time_control)
+        for row in rows:
+            print(f"{row['date']}  {row['white']} - {row['black']}  {row['result']}  {row['eco']}  "
+                  f"{row['time_control']}  {row['file']}@{row['offset']}")
+        print(f"{len(rows)} matching games")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
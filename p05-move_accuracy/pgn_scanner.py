@@ -0,0 +1,63 @@
+import chess
+import chess.pgn
+import os
+
+# Streaming scan over a directory of PGN files. Headers are read for every game
+# (chess.pgn.read_headers skips the movetext without building a game tree); only games
+# that pass the header filter are parsed, one at a time, so memory stays flat
+# however many games the archive holds.
+
+
+def iter_pgn_files(pgn_dir):
+    """Paths of the .pgn files in pgn_dir, in name order"""
+    for filename in sorted(os.listdir(pgn_dir)):
+        if filename.endswith(".pgn"):
+            yield os.path.join(pgn_dir, filename)
+
+
+def player_color(headers, player):
+    """chess.WHITE / chess.BLACK if player is in the game, else None"""
+    if player.lower() == headers.get("White", "").lower():
+        return chess.WHITE
+    if player.lower() == headers.get("Black", "").lower():
+        return chess.BLACK
+    return None
+
+
+def scan_headers(filepath):
+    """Yield (offset, length, headers) for each game in filepath; offset and length are in bytes"""
+    with open(filepath, "r", encoding="utf-8") as f:
+        while True:
+            offset = f.tell()  # a plain byte position: read_headers stops at line boundaries
+            headers = chess.pgn.read_headers(f)
+            if headers is None:
+                break
+            yield offset, f.tell() - offset, headers
+
+
+def read_game_at(filepath, offset):
+    """Parse the game starting at a byte offset returned by scan_headers"""
+    with open(filepath, "r", encoding="utf-8") as f:
+        f.seek(offset)
+        return chess.pgn.read_game(f)
+
+
+def scan_player_games(pgn_dir, player):
+    """Yield {"game", "color", "color_name", "moves"} for each game player took part in, parsed lazily"""
+    for filepath in iter_pgn_files(pgn_dir):
+        with open(filepath, "r", encoding="utf-8") as f:  # one handle per file for the matching games
+            for offset, _, headers in scan_headers(filepath):
+                color = player_color(headers, player)
+                if color is None:
+                    continue
+                f.seek(offset)
+                yield make_player_game(chess.pgn.read_game(f), color)
+
+
+def make_player_game(game, color):
+    return {
+        "game": game,
+        "color": color,
+        "color_name": "white" if color == chess.WHITE else "black",
+        "moves": list(game.mainline_moves()),
+    }